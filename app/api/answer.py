@@ -6,7 +6,7 @@ from fastapi.responses import StreamingResponse
 import os
 import json as _json
 import asyncio
-import threading
+from contextlib import aclosing
 
 from services.generation import GenerationService
 from fastapi.concurrency import run_in_threadpool
@@ -44,7 +44,7 @@ def create_answer_router(gen: GenerationService) -> APIRouter:
                 # Check provider client availability
                 has_client = False
                 try:
-                    has_client = bool(gen.llm_provider.client)
+                    has_client = bool(gen.llm_provider.aclient)
                 except Exception:
                     pass
 
@@ -55,35 +55,20 @@ def create_answer_router(gen: GenerationService) -> APIRouter:
                     payload = {"type": "meta", "citations": [], "warnings": prep.get("warnings", []), "confidence": 0.0, "groundedness": None}
                     yield f"data: {_json.dumps(payload)}\n\n"
                     
-                    # Bridge threaded token stream -> async generator via queue
-                    queue: asyncio.Queue = asyncio.Queue()
-                    loop = asyncio.get_running_loop()
+                    # Tokens come straight off the async client on this event loop
                     full_text = []
-
-                    def _run_stream():
-                        try:
-                            for tok in gen.iter_llm_tokens(prep.get("messages") or []):
-                                if tok:
-                                    # Accumulate text for citation processing
-                                    loop.call_soon_threadsafe(full_text.append, tok)
-                                loop.call_soon_threadsafe(queue.put_nowait, tok)
-                        except Exception:
-                            pass
-                        finally:
-                            loop.call_soon_threadsafe(queue.put_nowait, None)
-
-                    threading.Thread(target=_run_stream, daemon=True).start()
-
                     delay_ms = settings.stream_chunk_delay_ms
-                    while True:
-                        part = await queue.get()
-                        if part is None:
-                            break
-                        yield f"data: {_json.dumps({'type':'chunk','text': str(part)})}\n\n"
-                        try:
-                            await asyncio.sleep(max(0.0, float(delay_ms)/1000.0))
-                        except Exception:
-                            await asyncio.sleep(0)
+                    # aclosing: a client disconnect closes the provider stream (and its
+                    # upstream response) right away
+                    async with aclosing(gen.aiter_llm_tokens(prep.get("messages") or [])) as tokens:
+                        async for part in tokens:
+                            # Accumulate text for citation processing
+                            full_text.append(part)
+                            yield f"data: {_json.dumps({'type':'chunk','text': str(part)})}\n\n"
+                            try:
+                                await asyncio.sleep(max(0.0, float(delay_ms)/1000.0))
+                            except Exception:
+                                await asyncio.sleep(0)
                     
                     # Post-stream: Process citations based on full text
                     final_ans = "".join(full_text)
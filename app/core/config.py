@@ -41,6 +41,7 @@ class Settings(BaseSettings):
     ingest_disallowed_exts: str = Field(default=".js,.exe,.sh,.bat,.dll,.msi,.apk,.bin", alias="INGEST_DISALLOWED_EXTS")
     ingest_strict_mode: bool = Field(default=False, alias="INGEST_STRICT_MODE")
     ingest_rate_limit_per_min: int = Field(default=120, alias="INGEST_RATE_LIMIT_PER_MIN")
+    ingest_inmem_max_mb: int = Field(default=8, alias="INGEST_INMEM_MAX_MB")
 
     # Security
     idp_api_key: str | None = Field(default=None, alias="IDP_API_KEY")
@@ -51,6 +52,8 @@ class Settings(BaseSettings):
     ocr_langs: str = Field(default="en", alias="OCR_LANGS")
     ocr_max_pages: int = Field(default=25, alias="OCR_MAX_PAGES")
     pdf_native_only_if_pages_gt: int = Field(default=300, alias="PDF_NATIVE_ONLY_IF_PAGES_GT")
+    pdf_page_workers: int = Field(default=4, alias="PDF_PAGE_WORKERS")
+    pdf_parallel_min_pages: int = Field(default=10, alias="PDF_PARALLEL_MIN_PAGES")
     parse_method: str = Field(default="auto", alias="PARSE_METHOD")
     parse_auto_ocr_fallback: bool = Field(default=True, alias="PARSE_AUTO_OCR_FALLBACK")
     parse_sparse_text_threshold: int = Field(default=400, alias="PARSE_SPARSE_TEXT_THRESHOLD")
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Protocol, Optional, Iterator
+from typing import List, Dict, Any, Protocol, Optional, AsyncIterator
 from dataclasses import dataclass
 
 @dataclass
@@ -44,5 +44,5 @@ class LLMProvider(Protocol):
     def generate_json(self, messages: List[Dict[str, str]], **kwargs) -> str:
         ...
 
-    def stream(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+    def astream(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
         ...
@@ -23,6 +23,8 @@ class DBClient:
                 "password": password,
             }
         self.conn = None
+        # Bumped on every chunk write/delete so in-process caches over `chunks` can invalidate.
+        self.chunks_epoch = 0
 
     def connect(self):
         if self.conn is None:
@@ -155,46 +157,37 @@ class DBClient:
             """, adapted)
         return len(adapted)
 
-    def replace_graph(self, doc_id: str, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> None:
+    def replace_graph(self, doc_id: str, nodes: List[Tuple], edges: List[Tuple]) -> None:
+        """Replace a doc's graph. Rows are positional tuples:
+        nodes: (node_id, doc_id, type, label, meta)
+        edges: (edge_id, doc_id, src_node_id, dst_node_id, rel_type, weight, meta)
+        """
+        def _meta(meta):
+            if meta is not None and not isinstance(meta, str):
+                return Json(meta, dumps=_json_dumps)
+            return meta
+
         self.connect()
         with self.conn.cursor() as cur:
             cur.execute("DELETE FROM kg_edges WHERE doc_id=%s;", (doc_id,))
             cur.execute("DELETE FROM kg_nodes WHERE doc_id=%s;", (doc_id,))
 
             if nodes:
-                node_records = []
-                for n in nodes:
-                    record = dict(n)
-                    meta = record.get("meta")
-                    if meta is not None and not isinstance(meta, str):
-                        record["meta"] = Json(meta, dumps=_json_dumps)
-                    else:
-                        record["meta"] = meta
-                    node_records.append(record)
                 cur.executemany(
                     """
                     INSERT INTO kg_nodes (node_id, doc_id, type, label, meta)
-                    VALUES (%(node_id)s, %(doc_id)s, %(type)s, %(label)s, %(meta)s)
+                    VALUES (%s, %s, %s, %s, %s)
                     """,
-                    node_records,
+                    [(*n[:4], _meta(n[4])) for n in nodes],
                 )
 
             if edges:
-                edge_records = []
-                for e in edges:
-                    record = dict(e)
-                    meta = record.get("meta")
-                    if meta is not None and not isinstance(meta, str):
-                        record["meta"] = Json(meta, dumps=_json_dumps)
-                    else:
-                        record["meta"] = meta
-                    edge_records.append(record)
                 cur.executemany(
                     """
                     INSERT INTO kg_edges (edge_id, doc_id, src_node_id, dst_node_id, rel_type, weight, meta)
-                    VALUES (%(edge_id)s, %(doc_id)s, %(src_node_id)s, %(dst_node_id)s, %(rel_type)s, %(weight)s, %(meta)s)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
                     """,
-                    edge_records,
+                    [(*e[:6], _meta(e[6])) for e in edges],
                 )
 
     def fetch_graph_neighbors(self, doc_id: str, block_ids: List[str], limit: int = 32) -> List[Dict[str, Any]]:
@@ -565,6 +558,7 @@ class DBClient:
         return rows or []
 
     def delete_chunks_for_doc(self, doc_id: str) -> int:
+        self.chunks_epoch += 1
         with self.conn.cursor() as cur:
             cur.execute("DELETE FROM chunks WHERE doc_id=%s;", (doc_id,))
             return cur.rowcount
@@ -590,6 +584,7 @@ class DBClient:
             if "meta" in x and x["meta"] is not None and not isinstance(x["meta"], str):
                 x["meta"] = Json(x["meta"], dumps=_json_dumps)   # <- use safe dumper
             adapted.append(x)
+        self.chunks_epoch += 1
         with self.conn.cursor() as cur:
             cur.executemany("""
                 INSERT INTO chunks (chunk_id, plan_id, doc_id, span_start, span_end,
@@ -690,13 +685,48 @@ class DBClient:
             can = row.get("canonical_uri")
         else:
             uri, sha, can = row
+        return {"uri": uri, "minio_key": self._minio_key_for_sha(sha), "canonical_uri": can}
+
+    def get_doc_storage_keys_bulk(self, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Same as get_doc_storage_keys for many docs in one round trip; keyed by doc_id text.
+        Docs that do not exist (or ids that are not UUIDs, e.g. synthetic hits) are absent from the result."""
+        ids = []
+        for d in dict.fromkeys(d for d in doc_ids if d):
+            try:
+                uuid.UUID(str(d))
+            except ValueError:
+                continue
+            ids.append(str(d))
+        if not ids:
+            return {}
+        self.connect()
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT DISTINCT ON (d.doc_id) d.doc_id::text AS doc_id, d.uri, d.sha256, n.canonical_uri
+                FROM documents d
+                LEFT JOIN normalizations n ON n.doc_id = d.doc_id
+                WHERE d.doc_id = ANY(%s::uuid[])
+                """,
+                (ids,),
+            )
+            rows = cur.fetchall()
+        out: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            if isinstance(row, dict):
+                did, uri, sha, can = row.get("doc_id"), row.get("uri"), row.get("sha256"), row.get("canonical_uri")
+            else:
+                did, uri, sha, can = row
+            out[did] = {"uri": uri, "minio_key": self._minio_key_for_sha(sha), "canonical_uri": can}
+        return out
 
-        minio_key = None
+    @staticmethod
+    def _minio_key_for_sha(sha) -> Optional[str]:
         if sha:
             s = str(sha)
             if len(s) >= 4:
-                minio_key = f"sha256/{s[0:2]}/{s[2:4]}/{s}"
-        return {"uri": uri, "minio_key": minio_key, "canonical_uri": can}
+                return f"sha256/{s[0:2]}/{s[2:4]}/{s}"
+        return None
 
     def wipe_tenant_data(self, tenant_id: str) -> Dict[str, Any]:
         """
@@ -742,6 +772,7 @@ class DBClient:
             else:
                 canon_prefixes.add(str(doc_id))
 
+        self.chunks_epoch += 1
         with self.conn.cursor() as cur:
             cur.execute("DELETE FROM events WHERE tenant_id=%s;", (tenant_id,))
             events_deleted = cur.rowcount
@@ -1173,6 +1204,29 @@ class DBClient:
                 ),
             )
 
+    def insert_events_bulk(self, tenant_id: str, rows: List[Tuple[str, str, Dict[str, Any], Optional[str], Any]]) -> None:
+        """Insert many events in one batch. rows: (stage, status, details, doc_id, ts)."""
+        if not rows:
+            return
+        self.connect()
+        with self.conn.cursor() as cur:
+            cur.executemany(
+                """
+                INSERT INTO events (
+                    event_id, tenant_id, doc_id, stage, status,
+                    attempt, ts, details_json, trace_id, job_id
+                )
+                VALUES (%s, %s, %s, %s, %s, 1, %s, %s, %s, %s)
+                """,
+                [
+                    (
+                        str(uuid.uuid4()), tenant_id, doc_id, stage, status, ts,
+                        json.dumps(details, default=str), str(uuid.uuid4()), None,
+                    )
+                    for stage, status, details, doc_id, ts in rows
+                ],
+            )
+
 
     # ---- documents ----
     def find_doc_by_hash(self, tenant_id: str, sha256: str) -> Optional[str]:
@@ -1185,6 +1239,25 @@ class DBClient:
             did = row["doc_id"] if isinstance(row, dict) else row[0]
             return str(did) if did is not None else None
 
+    def find_docs_by_hashes(self, tenant_id: str, sha256s: List[str]) -> Dict[str, str]:
+        """Batch form of find_doc_by_hash: {sha256: doc_id} for the hashes already stored."""
+        wanted = list(dict.fromkeys(h for h in sha256s if h))
+        if not wanted:
+            return {}
+        self.connect()
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "SELECT DISTINCT ON (sha256) sha256, doc_id FROM documents WHERE tenant_id=%s AND sha256 = ANY(%s);",
+                (tenant_id, wanted),
+            )
+            rows = cur.fetchall()
+        out: Dict[str, str] = {}
+        for row in rows:
+            sha, did = (row["sha256"], row["doc_id"]) if isinstance(row, dict) else (row[0], row[1])
+            if did is not None:
+                out[sha] = str(did)
+        return out
+
     def insert_document(self, *, doc_id: str, tenant_id: str, sha256: str, uri: str, mime: str,
                         size_bytes: int, state: str, pipeline_versions: Dict[str, Any], meta: Dict[str, Any]):
         with self.conn.cursor() as cur:
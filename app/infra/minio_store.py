@@ -3,6 +3,21 @@ from minio import Minio
 from urllib.parse import urlparse
 from typing import BinaryIO, Optional
 import os
+import json
+
+# soft-dep: orjson serializes large manifests several times faster than json.dumps and
+# emits UTF-8 bytes directly (same as ensure_ascii=False + encode).
+try:
+    import orjson as _orjson
+
+    def _json_bytes(payload) -> bytes:
+        try:
+            return _orjson.dumps(payload, option=_orjson.OPT_NON_STR_KEYS)
+        except TypeError:  # types orjson won't encode (e.g. >64-bit ints): take the stdlib path
+            return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+except Exception:
+    def _json_bytes(payload) -> bytes:
+        return json.dumps(payload, ensure_ascii=False).encode("utf-8")
 
 
 class MinioStore:
@@ -32,6 +47,12 @@ class MinioStore:
             self.client.put_object(self.bucket, key, data=fp, length=size, content_type=content_type)
         return key
 
+    def put_bytes(self, sha256_hex: str, data: bytes, size: int, content_type: str) -> str:
+        import io
+        key = self.build_key_for_sha256(sha256_hex)
+        self.client.put_object(self.bucket, key, data=io.BytesIO(data), length=size, content_type=content_type)
+        return key
+
     def stat(self, key: str):
         return self.client.stat_object(self.bucket, key)
 
@@ -84,11 +105,10 @@ class MinioStore:
     def put_canonical_json(self, *, bucket: str, doc_id: str, name: str, payload: dict, version: str = "v1") -> str:
         key = f"{doc_id}/{version}/{name}"
         import io
-        import json
 
-        data = io.BytesIO(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
-        length = data.getbuffer().nbytes
-        data.seek(0)
+        body = _json_bytes(payload)
+        data = io.BytesIO(body)
+        length = len(body)
         self.client.put_object(
             bucket,
             key,
@@ -1,7 +1,8 @@
 # app/infra/storage.py
 from __future__ import annotations
-import os, datetime
-from typing import Optional
+import os, datetime, threading, time
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 import boto3
 from botocore.client import Config
 from core.config import settings
@@ -15,6 +16,8 @@ S3_BUCKET   = settings.s3_bucket
 S3_CANONICAL_BUCKET = settings.s3_canonical_bucket
 APP_ENV = settings.app_env.lower()
 
+# boto3 clients are thread-safe and costly to build; one per endpoint is enough.
+@lru_cache(maxsize=8)
 def _client(endpoint: str = None):
     url = endpoint or S3_ENDPOINT
     return boto3.client(
@@ -26,6 +29,10 @@ def _client(endpoint: str = None):
         config=Config(signature_version="s3v4"),
     )
 
+_PRESIGN_MEMO_MAX = 512
+_presign_memo: Dict[Tuple[str, str, int], Tuple[float, str]] = {}
+_presign_lock = threading.Lock()
+
 def presign(key: str, *, bucket: Optional[str] = None, expires: int = 3600) -> Optional[str]:
     if not key:
         return None
@@ -38,10 +45,23 @@ def presign(key: str, *, bucket: Optional[str] = None, expires: int = 3600) -> O
         # In dev, we can make a reasonable guess for local docker-compose setups.
         endpoint = "http://localhost:9000"
 
-    cli = _client(endpoint)
     bkt = bucket or S3_BUCKET
-    return cli.generate_presigned_url(
+    memo_key = (bkt, key, expires)
+    now = time.monotonic()
+    with _presign_lock:
+        hit = _presign_memo.get(memo_key)
+    if hit and hit[0] > now:
+        return hit[1]
+
+    cli = _client(endpoint)
+    url = cli.generate_presigned_url(
         "get_object",
         Params={"Bucket": bkt, "Key": key},
         ExpiresIn=expires,
     )
+    # Reuse a signed URL for half its lifetime so handed-out links stay valid for a while.
+    with _presign_lock:
+        if len(_presign_memo) >= _PRESIGN_MEMO_MAX:
+            _presign_memo.clear()
+        _presign_memo[memo_key] = (now + expires / 2, url)
+    return url
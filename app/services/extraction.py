@@ -527,7 +527,7 @@ class ExtractionService:
             except Exception as exc:
                 self.log("warn", "manifest-canonical-update-failed", doc_id=doc_id, error=str(exc))
 
-        dom_table_count = len([a for a in manifest.artifacts if a.type == "table"])
+        dom_table_count = sum(1 for _ in manifest.iter_tables())
         blk_table_count = sum(1 for r in blocks_rows if r["type"] == "table")
         checker_warnings: List[str] = []
         if dom_table_count != blk_table_count:
@@ -1,23 +1,106 @@
 # app/services/fact_lookup.py
 from __future__ import annotations
-import re
+import re, threading, time, uuid
+from collections import OrderedDict
 from typing import Any, Dict, List, Optional, Tuple
 
+from psycopg.rows import dict_row
+
 from infra.db import DBClient
 
 # Patterns for table-ish summaries
-_TOTAL_LABEL_RX = re.compile(r"\b(grand\s*total|total\s*amount|amount\s*due|total)\b[:\s]*([\₹$]?\s?[0-9][0-9,]*(?:\.[0-9]{1,2})?)", re.I)
+# Unicode \s on purpose: PDF text often puts NBSP / em-space between label and amount.
+_TOTAL_LABEL_RX = re.compile(r"\b(grand\s*total|total\s*amount|amount\s*due|total)\b[:\s]*([₹$]?\s?[0-9][0-9,]*(?:\.[0-9]{1,2})?)", re.I)
 _STUDENT_NAME_LINE_RX = re.compile(r"\bstudent\s*name\b[:\s-]*([A-Za-z][A-Za-z\s\.\'-]{1,80})", re.I)
-_CURRENCY_RX = re.compile(r"([\₹$]?\s?[0-9][0-9,]*(?:\.[0-9]{1,2})?)")
+_INVOICE_HINT_RX = re.compile(r"invoice", re.I | re.ASCII)
+_CURRENCY_PATTERN = r"([₹$]?\s?[0-9][0-9,]*(?:\.[0-9]{1,2})?)"
+# soft-dep: google-re2 runs the currency fallback as a linear-time DFA; degrade to `re`
+try:
+    import re2 as _re2  # type: ignore
+    _CURRENCY_RX = _re2.compile(_CURRENCY_PATTERN)
+except Exception:
+    _CURRENCY_RX = re.compile(_CURRENCY_PATTERN)
+
+# Chunk scan statements. One ILIKE ANY(array) predicate keeps the text identical whatever
+# the number of terms, so psycopg can prepare each once per connection.
+_SCAN_SQL_WITH_DOCS = """
+    SELECT c.chunk_id::text, c.doc_id::text, c.text
+    FROM unnest(%s::uuid[]) AS u(doc_id)
+    JOIN chunks c ON c.doc_id = u.doc_id
+    WHERE c.text ILIKE ANY(%s)
+    LIMIT %s
+"""
+_SCAN_SQL_RECENT = """
+    SELECT c.chunk_id::text, c.doc_id::text, c.text
+    FROM chunks c
+    JOIN documents d ON d.doc_id = c.doc_id
+    WHERE c.text ILIKE ANY(%s)
+    ORDER BY d.extracted_at DESC NULLS LAST
+    LIMIT %s
+"""
+_STUDENT_LIKE_TERMS = ["student", "name", "fees", "total", "amount due"]
+
+# Memo for _scan_chunks: repeat plans (retries, follow-ups) skip the ILIKE scan.
+# Keyed on the DB chunk epoch so any chunk write invalidates older entries.
+_SCAN_CACHE_MAX = 512
+_SCAN_CACHE_TTL_S = 60.0
+_scan_cache: "OrderedDict[tuple, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+_scan_cache_lock = threading.Lock()
+
+def _scan_cache_get(key: tuple) -> Optional[List[Dict[str, Any]]]:
+    with _scan_cache_lock:
+        item = _scan_cache.get(key)
+        if item is None:
+            return None
+        expires, rows = item
+        if expires < time.monotonic():
+            _scan_cache.pop(key, None)
+            return None
+        _scan_cache.move_to_end(key)
+        return rows
+
+def _scan_cache_put(key: tuple, rows: List[Dict[str, Any]]) -> None:
+    with _scan_cache_lock:
+        _scan_cache[key] = (time.monotonic() + _SCAN_CACHE_TTL_S, rows)
+        _scan_cache.move_to_end(key)
+        while len(_scan_cache) > _SCAN_CACHE_MAX:
+            _scan_cache.popitem(last=False)
+
+_CURRENCY_STRIP = str.maketrans("", "", ",₹$ \t")
 
 def _as_float(s: str) -> Optional[float]:
     try:
-        if not s: return None
-        v = s.replace(",", "").replace("₹", "").replace("$", "").strip()
-        return float(v)
-    except Exception:
+        return float(s.translate(_CURRENCY_STRIP))
+    except (AttributeError, TypeError, ValueError):
         return None
 
+def _first_positive_amount(text: str) -> Optional[float]:
+    # Hot loop of the invoice fallback: strip/parse each currency hit inline (no _as_float
+    # frame per match) and skip "0"/"0.00" style hits before touching float().
+    strip = _CURRENCY_STRIP
+    for m in _CURRENCY_RX.finditer(text):
+        s = m.group(1).translate(strip)
+        if not s.strip("0.,"):
+            continue
+        try:
+            val = float(s)
+        except ValueError:
+            continue
+        if val > 0:
+            return val
+    return None
+
+def _uuid_ids(doc_ids: List[str]) -> List[str]:
+    """Drop ids that are not UUIDs (they can never match, and would fail the uuid[] cast)."""
+    out = []
+    for d in doc_ids:
+        try:
+            uuid.UUID(str(d))
+        except ValueError:
+            continue
+        out.append(str(d))
+    return out
+
 def _page_from_meta(meta: Dict[str, Any] | None) -> int:
     m = meta or {}
     for k in ("page_start", "page", "p", "pg"):
@@ -84,38 +167,38 @@ class FactLookupService:
         except Exception:
             pass
 
+        return self._invoice_total_from_chunks(invoice_no, doc_ids)
+
+    def _invoice_total_from_chunks(self, invoice_no: str, doc_ids: List[str]) -> Optional[Dict[str, Any]]:
         # 2) Fallback: scan chunks within doc_ids (or across recent docs if none given)
-        hits = self._scan_chunks(
-            doc_ids=doc_ids,
-            like_terms=["invoice", invoice_no],
-            limit=200
-        )
+        scan = dict(doc_ids=doc_ids, like_terms=["invoice", invoice_no], limit=200)
 
-        best_total: Optional[Tuple[str, float, Dict[str, Any]]] = None  # (chunk_id, value, chunk)
+        best_ch: Optional[Dict[str, Any]] = None
+        best_val = 0.0
+        # Pass 1: a direct "Total: X" label always outranks a bare currency hit, so the
+        # first parseable label match wins outright.
+        hits = self._scan_chunks(**scan)
         for ch in hits:
-            text = (ch.get("text") or "")
-            # Prefer direct "Total: X" lines
-            for m in _TOTAL_LABEL_RX.finditer(text):
-                val = _as_float(m.group(2))
-                if val is None: continue
-                score = 2.0  # direct label match
-                if (best_total is None) or (score > best_total[1]):
-                    best_total = (ch["chunk_id"], val, ch)
-            # fallback: any currency numbers on lines with invoice hint
-            if "invoice" in text.lower():
-                for m in _CURRENCY_RX.finditer(text):
-                    val = _as_float(m.group(1))
-                    if val and val > 0:
-                        score = 1.0
-                        if (best_total is None) or (score > best_total[1]):
-                            best_total = (ch["chunk_id"], val, ch)
-
-        if best_total:
-            cid, val, ch = best_total
-            p = _page_from_meta(ch.get("meta"))
-            ans = f"Invoice {invoice_no} total: {val:.2f}."
-            cite = [{"n": 1, "doc_id": ch["doc_id"], "chunk_id": cid, "page_start": p, "page_end": p, "uri": ch.get("uri")}]
-            return {"answer": ans, "citations": cite, "used_chunks": [cid], "confidence": 0.7}
+            m = _TOTAL_LABEL_RX.search(ch.get("text") or "")
+            if not m: continue
+            val = _as_float(m.group(2))
+            if val is None: continue
+            best_ch, best_val = ch, val
+            break
+        # Pass 2: fallback to any positive currency number in chunks hinting "invoice".
+        if best_ch is None:
+            for ch in hits:
+                text = (ch.get("text") or "")
+                if not _INVOICE_HINT_RX.search(text): continue
+                val = _first_positive_amount(text)
+                if val is not None:
+                    best_ch, best_val = ch, val
+                    break
+
+        if best_ch is not None:
+            ans = f"Invoice {invoice_no} total: {best_val:.2f}."
+            cite = [self._chunk_citation(1, best_ch)]
+            return {"answer": ans, "citations": cite, "used_chunks": [best_ch["chunk_id"]], "confidence": 0.7}
 
         return None
 
@@ -123,11 +206,13 @@ class FactLookupService:
         # Try structured tables if you have them; else scan chunks
         hits = self._scan_chunks(
             doc_ids=doc_ids,
-            like_terms=["student", "name", "fees", "total", "amount due"],
+            like_terms=_STUDENT_LIKE_TERMS,
             limit=200
         )
         student_name = None
-        best_total: Optional[Tuple[str, float, Dict[str, Any]]] = None
+        name_chunk: Optional[Dict[str, Any]] = None
+        total_ch: Optional[Dict[str, Any]] = None
+        total_val = 0.0
 
         for ch in hits:
             text = (ch.get("text") or "")
@@ -135,13 +220,13 @@ class FactLookupService:
                 m = _STUDENT_NAME_LINE_RX.search(text)
                 if m:
                     student_name = m.group(1).strip().strip(":").strip()
-            if want_total:
-                for m in _TOTAL_LABEL_RX.finditer(text):
+                    name_chunk = ch
+            if want_total and total_ch is None:
+                m = _TOTAL_LABEL_RX.search(text)
+                if m:
                     val = _as_float(m.group(2))
-                    if val is None: continue
-                    score = 2.0
-                    if (best_total is None) or (score > best_total[1]):
-                        best_total = (ch["chunk_id"], val, ch)
+                    if val is not None:
+                        total_ch, total_val = ch, val
 
         # Build answer
         parts = []
@@ -150,25 +235,17 @@ class FactLookupService:
         conf = 0.0
         idx = 1
 
-        if student_name:
+        if student_name and name_chunk is not None:
             parts.append(f"Student name: {student_name} [^{idx}].")
-            ch = hits[0]  # not strictly accurate; we’ll try to find a cite with name
-            for ch in hits:
-                if _STUDENT_NAME_LINE_RX.search(ch.get("text") or ""):
-                    p = _page_from_meta(ch.get("meta")); used.append(ch["chunk_id"])
-                    cites.append({"n": idx, "doc_id": ch["doc_id"], "chunk_id": ch["chunk_id"], "page_start": p, "page_end": p, "uri": ch.get("uri")})
-                    break
-            else:
-                cites.append({"n": idx})
+            used.append(name_chunk["chunk_id"])
+            cites.append(self._chunk_citation(idx, name_chunk))
             idx += 1
             conf += 0.35
 
-        if best_total:
-            cid, val, ch = best_total
-            p = _page_from_meta(ch.get("meta"))
-            parts.append(f"Total fees: {val:.2f} [^{idx}].")
-            cites.append({"n": idx, "doc_id": ch["doc_id"], "chunk_id": cid, "page_start": p, "page_end": p, "uri": ch.get("uri")})
-            used.append(cid)
+        if total_ch is not None:
+            parts.append(f"Total fees: {total_val:.2f} [^{idx}].")
+            cites.append(self._chunk_citation(idx, total_ch))
+            used.append(total_ch["chunk_id"])
             conf += 0.45
             idx += 1
 
@@ -183,38 +260,54 @@ class FactLookupService:
         }
 
     # --------- helpers ---------
+    def _chunk_citation(self, n: int, ch: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a citation for a winning chunk; meta/uri are fetched only here, not in the scan."""
+        meta, uri = None, None
+        try:
+            self.db.connect()
+            with self.db.conn.cursor() as cur:
+                cur.execute("""
+                    SELECT c.meta, d.uri
+                    FROM chunks c
+                    JOIN documents d ON d.doc_id = c.doc_id
+                    WHERE c.chunk_id = %s
+                    LIMIT 1
+                """, (ch["chunk_id"],))
+                row = cur.fetchone()
+            if row:
+                meta, uri = (row.get("meta"), row.get("uri")) if isinstance(row, dict) else row
+        except Exception:
+            pass
+        p = _page_from_meta(meta)
+        return {"n": n, "doc_id": ch["doc_id"], "chunk_id": ch["chunk_id"], "page_start": p, "page_end": p, "uri": uri}
+
     def _scan_chunks(self, *, doc_ids: List[str], like_terms: List[str], limit: int = 200) -> List[Dict[str, Any]]:
         """
         Pull chunks whose text ILIKE any of the like_terms. If no doc_ids, scan recent extracted docs.
+        Results are memoized briefly; see _scan_cache_get.
         """
+        if doc_ids:
+            doc_ids = _uuid_ids(doc_ids)
+            if not doc_ids:
+                return []
+        key = self._scan_key(doc_ids, like_terms, limit)
+        cached = _scan_cache_get(key)
+        if cached is not None:
+            return cached
+        sql, params = self._scan_sql(doc_ids, like_terms, limit)
         self.db.connect()
-        rows: List[Dict[str, Any]] = []
-        with self.db.conn.cursor() as cur:
-            if doc_ids:
-                cur.execute("""
-                    SELECT c.chunk_id::text, c.doc_id::text, c.text, c.meta, d.uri, d.mime
-                    FROM chunks c
-                    JOIN documents d ON d.doc_id = c.doc_id
-                    WHERE c.doc_id::text = ANY(%s)
-                      AND (""" + " OR ".join(["c.text ILIKE %s" for _ in like_terms]) + """)
-                    LIMIT %s
-                """, (doc_ids, *[f"%{t}%" for t in like_terms], limit))
-            else:
-                cur.execute("""
-                    SELECT c.chunk_id::text, c.doc_id::text, c.text, c.meta, d.uri, d.mime
-                    FROM chunks c
-                    JOIN documents d ON d.doc_id = c.doc_id
-                    WHERE (""" + " OR ".join(["c.text ILIKE %s" for _ in like_terms]) + """)
-                    ORDER BY d.extracted_at DESC NULLS LAST
-                    LIMIT %s
-                """, (*[f"%{t}%" for t in like_terms], limit))
-            rows = cur.fetchall()
-
-        out: List[Dict[str, Any]] = []
-        for r in rows:
-            if isinstance(r, dict):
-                out.append(r)
-            else:
-                cid, did, text, meta, uri, mime = r
-                out.append({"chunk_id": cid, "doc_id": did, "text": text, "meta": meta, "uri": uri, "mime": mime})
+        with self.db.conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(sql, params, prepare=True)
+            out = cur.fetchall()
+        _scan_cache_put(key, out)
         return out
+
+    def _scan_key(self, doc_ids: List[str], like_terms: List[str], limit: int) -> tuple:
+        return (getattr(self.db, "chunks_epoch", 0), tuple(sorted(doc_ids)), tuple(like_terms), limit)
+
+    @staticmethod
+    def _scan_sql(doc_ids: List[str], like_terms: List[str], limit: int) -> Tuple[str, tuple]:
+        patterns = [f"%{t}%" for t in like_terms]
+        if doc_ids:
+            return _SCAN_SQL_WITH_DOCS, (sorted(set(doc_ids)), patterns, limit)
+        return _SCAN_SQL_RECENT, (patterns, limit)
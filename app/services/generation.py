@@ -1,7 +1,10 @@
 # app/services/generation.py
 from __future__ import annotations
-import os, json, time, math, re
-from typing import Any, Dict, List, Optional, Tuple, Iterator
+import os, json, time, re, threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from services.fact_lookup import FactLookupService
 # soft-deps: we degrade gracefully if they’re not present
 try:
@@ -9,6 +12,11 @@ try:
 except Exception:
     json_validate = None
     class ValidationError(Exception): ...
+try:
+    import orjson as _orjson
+    _json_loads = _orjson.loads  # accepts str; errors subclass ValueError
+except Exception:
+    _json_loads = json.loads
 
 from infra.db import DBClient
 import os as _os
@@ -19,6 +27,17 @@ import backoff
 from core.config import settings
 from services.llm import OpenAIProvider, pack_context, build_messages, build_messages_no_context, OUT_SCHEMA
 
+# Output schema is compiled once: fastjsonschema generates a checker function; otherwise reuse
+# one jsonschema validator instead of re-checking the schema on every validate() call.
+_validate_out = None
+try:
+    import fastjsonschema  # type: ignore
+    _validate_out = fastjsonschema.compile(OUT_SCHEMA)
+except Exception:
+    if json_validate:
+        from jsonschema.validators import validator_for
+        _validate_out = validator_for(OUT_SCHEMA)(OUT_SCHEMA).validate
+
 # Router is optional; don’t crash if module/file isn’t there
 try:
     from services.router import QueryRouter  # type: ignore
@@ -26,72 +45,128 @@ except Exception:
     QueryRouter = None  # type: ignore
 
 def _estimated_tokens(text: str) -> int:
-    return max(1, math.ceil(len(text or "") / 4))
+    # ~3 chars/token for BPE models; integer math only (feeds event metrics, not budgeting)
+    return (len(text or "") + 2) // 3 or 1
+
+# Patterns used on every question; compiled once instead of via the re module cache
+_CITE_RX = re.compile(r"\[\^(\d+)\]")
+_NUM_RX = re.compile(r"\b\d+(?:[\.,]\d+)?\b")
+_INTENT_TOTAL_RX = re.compile(r"\b(total|amount|sum|grand total|balance due)\b")
+_INTENT_LIST_RX = re.compile(r"\b(list|show|summarize|summarise|items|line items)\b")
+_INTENT_CLAUSE_RX = re.compile(r"\b(payment terms|termination|limitation of liability|governing law|confidentiality|clause)\b")
+_ANSWER_HDR_RX = re.compile(r"##\s*Answer\s*\n")
 
 def _extract_cite_nums(s: str) -> List[int]:
+    if not s or "[^" not in s:
+        return []
     try:
-        nums = [int(m.group(1)) for m in re.finditer(r"[\^(\\d+)]", s or "")]
         # preserve order but unique
-        out = []
-        for n in nums:
-            if n not in out:
-                out.append(n)
-        return out
+        return list(dict.fromkeys(int(m.group(1)) for m in _CITE_RX.finditer(s)))
     except Exception:
         return []
 
+# ASCII alphanumerics survive, every other byte becomes a separator. Non-ASCII characters are
+# encoded as "?" first, so tokens match the old [^A-Za-z0-9]+ split exactly.
+_TOK_TABLE = bytes.maketrans(
+    bytes(range(256)),
+    bytes(c if (48 <= c <= 57 or 65 <= c <= 90 or 97 <= c <= 122) else 32 for c in range(256)),
+)
+
 def _token_set(s: str) -> set:
-    toks = re.split(r"[^A-Za-z0-9]+", (s or "").lower())
-    return set([t for t in toks if len(t) >= 3])
+    toks = (s or "").lower().encode("ascii", "replace").translate(_TOK_TABLE).split()
+    return {t for t in toks if len(t) >= 3}
 
 def _numbers_in(s: str) -> List[str]:
-    return re.findall(r"\b\d+(?:[\.,]\d+)?\b", s or "")
+    if not s or not any(c.isdigit() for c in s):
+        return []
+    return _NUM_RX.findall(s)
 
-def _groundedness(answer: str, context: str) -> float:
+def _groundedness_vs(answer: str, cts: set, cnum: set) -> float:
+    # Context-side sets are built once by the caller; the work here scales with the answer.
     try:
-        ats = _token_set(answer); cts = _token_set(context)
+        ats = _token_set(answer)
         if not ats:
             return 0.0
-        inter = len(ats.intersection(cts)); base = inter / max(1, len(ats))
-        anum = set(_numbers_in(answer)); cnum = set(_numbers_in(context))
-        num_score = (len(anum.intersection(cnum)) / max(1, len(anum))) if anum else base
+        # answer sets are small: count membership hits rather than building intersection sets
+        base = sum(1 for t in ats if t in cts) / len(ats)
+        anums = _numbers_in(answer)
+        if not anums:
+            return round(base, 3)
+        anum = set(anums)
+        num_score = sum(1 for n in anum if n in cnum) / len(anum)
         # weight numbers slightly higher for numeric queries
         return round(0.4 * base + 0.6 * num_score, 3)
     except Exception:
         return 0.0
 
+# Questions repeat a lot in chat sessions; the result depends only on the text
+@lru_cache(maxsize=2048)
 def _intent(q: str) -> str:
     s = (q or "").lower()
     # Use regex for precise word matching
-    if re.search(r"\b(total|amount|sum|grand total|balance due)\b", s):
+    if _INTENT_TOTAL_RX.search(s):
         return "NUMERIC_TOTAL"
-    if re.search(r"\b(list|show|summarize|summarise|items|line items)\b", s):
+    if _INTENT_LIST_RX.search(s):
         return "LIST"
-    if re.search(r"\b(payment terms|termination|limitation of liability|governing law|confidentiality|clause)\b", s):
+    if _INTENT_CLAUSE_RX.search(s):
         return "CLAUSE"
     return "DEFAULT"
 
+# Thousands separators never span a line break (anything str.splitlines() splits on), so
+# one scan over the whole context yields the same amounts as scanning line by line.
 _money_rx = re.compile(
-    r"(?<!\w)(?:₹|rs\.?\s*|usd\s*\$|\$)?\s*([0-9]{1,3}(?:[,\s][0-9]{2,3})*(?:\.[0-9]{1,2})|[0-9]+(?:\.[0-9]{1,2})?)",
+    r"(?<!\w)(?:₹|rs\.?\s*|usd\s*\$|\$)?\s*([0-9]{1,3}(?:(?:,|[^\S\n\r\v\f\x1c-\x1e\x85\u2028\u2029])[0-9]{2,3})*(?:\.[0-9]{1,2})|[0-9]+(?:\.[0-9]{1,2})?)",
     re.I
 )
 
 def _try_sum_from_context(context: str) -> Optional[float]:
     # rough heuristic: sum all positive currency-like numbers; used only as a hint
+    if not context or not any(ch.isdigit() for ch in context):
+        return None
     nums = []
-    for line in (context or "").splitlines():
-        for m in _money_rx.finditer(line):
-            try:
-                raw = m.group(1).replace(",", "").replace(" ", "")
-                val = float(raw)
-                if val > 0:
-                    nums.append(val)
-            except Exception:
-                continue
+    for m in _money_rx.finditer(context):
+        try:
+            val = float(m.group(1).replace(",", "").replace(" ", ""))
+        except ValueError:
+            continue
+        if val > 0:
+            nums.append(val)
     if len(nums) >= 2:
         return round(sum(nums), 2)
     return None
 
+def _wants_total(q: str) -> bool:
+    s = (q or "").lower()
+    return any(k in s for k in ["total spend", "spend", "amount due", "total amount", "sum of invoices"]) \
+        or ("invoice" in s and any(k in s for k in ["total", "amount"]))
+
+# Small shared pool for overlapping independent I/O inside answer()
+_EXEC = ThreadPoolExecutor(max_workers=4, thread_name_prefix="generation")
+
+# Short-lived memo of retrieval hits so a replayed question (stream prep followed by the
+# non-stream fallback, client retries) skips the vector + keyword search. Keyed on the DB
+# chunk epoch, so any chunk write invalidates older entries.
+_RETRIEVAL_CACHE_MAX = 256
+_RETRIEVAL_CACHE_TTL_S = 30.0
+_retrieval_cache: "OrderedDict[tuple, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+_retrieval_cache_lock = threading.Lock()
+
+_GREET1 = frozenset({"hi", "hello", "hey", "howdy", "yo"})
+_GREET_GOOD = frozenset({"morning", "afternoon", "evening"})
+_GREET_PUNCT = "!,.?"
+
+@lru_cache(maxsize=2048)
+def _is_greeting(q: str) -> bool:
+    s = (q or "").strip().lower()
+    if not s:
+        return False
+    # compare whole first word(s); a bare prefix test also caught "your ...", "history ..."
+    first, _, rest = s.partition(" ")
+    first = first.rstrip(_GREET_PUNCT)
+    if first in _GREET1:
+        return True
+    return first == "good" and rest.partition(" ")[0].rstrip(_GREET_PUNCT) in _GREET_GOOD
+
 # ---------- main service ----------
 class GenerationService:
     def __init__(self, db: DBClient, retrieval: RetrievalService, *, tenant_id: str, logger, router: Optional[Any]=None):
@@ -110,20 +185,14 @@ class GenerationService:
         )
 
     def _is_greeting(self, q: str) -> bool:
-        s = (q or "").strip().lower()
-        return bool(s) and any(
-            s.startswith(w) or s == w for w in [
-                "hi", "hello", "hey", "howdy", "yo", "good morning", "good afternoon", "good evening"
-            ]
-        )
+        return _is_greeting(q)
 
-    # ---------- streaming prep & tokens (optional) ----------
-    def prepare_for_stream(self, q: str, k: int = 8, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        warnings: List[str] = []
+    # ---------- plan & retrieval (shared by answer / prepare_for_stream) ----------
+    def _plan(self, q: str, k: int, filters: Dict[str, Any]) -> Dict[str, Any]:
         # route (optional) -> plan
         if self.router and hasattr(self.router, "route"):
             try:
-                plan = self.router.route(q, want_k=k, filters=filters or {}) or {}
+                plan = self.router.route(q, want_k=k, filters=filters) or {}
             except Exception as e:
                 self.log("warn", "router-fail", reason=str(e))
                 plan = {}
@@ -132,12 +201,44 @@ class GenerationService:
         plan.setdefault("semantic_query", q)
         plan.setdefault("k", k)
         plan.setdefault("hybrid", True)
-        plan.setdefault("filters", filters or {})
+        plan.setdefault("filters", filters)
+        return plan
+
+    def _retrieve(self, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+        key = (
+            self.tenant_id, getattr(self.db, "chunks_epoch", 0),
+            plan["semantic_query"], plan["k"], bool(plan["hybrid"]),
+            json.dumps(plan["filters"], sort_keys=True, default=str),
+        )
+        now = time.monotonic()
+        with _retrieval_cache_lock:
+            item = _retrieval_cache.get(key)
+            if item is not None and item[0] > now:
+                _retrieval_cache.move_to_end(key)
+                return list(item[1])
 
-        # retrieval
         ret = self.retrieval.search(q=plan["semantic_query"], k=plan["k"], hybrid=plan["hybrid"], filters=plan["filters"])  # type: ignore
         hits = ret.get("results", [])
+        if hits:  # don't pin an empty (possibly degraded) result
+            with _retrieval_cache_lock:
+                _retrieval_cache[key] = (now + _RETRIEVAL_CACHE_TTL_S, hits)
+                _retrieval_cache.move_to_end(key)
+                while len(_retrieval_cache) > _RETRIEVAL_CACHE_MAX:
+                    _retrieval_cache.popitem(last=False)
+        # callers prepend synthetic hits; hand out a fresh list
+        return list(hits)
+
+    def _plan_and_retrieve(self, q: str, k: int, filters: Dict[str, Any]):
+        """(plan, hits, context_str, footnotes, used_chunks) for q."""
+        plan = self._plan(q, k, filters)
+        hits = self._retrieve(plan)
         context_str, footnotes, used_chunks = pack_context(q, hits, token_budget=settings.gen_token_budget)
+        return plan, hits, context_str, footnotes, used_chunks
+
+    # ---------- streaming prep & tokens (optional) ----------
+    def prepare_for_stream(self, q: str, k: int = 8, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        warnings: List[str] = []
+        plan, hits, context_str, footnotes, used_chunks = self._plan_and_retrieve(q, k, filters or {})
         mode = _intent(q)
         msgs = build_messages(q, context_str, mode)
 
@@ -148,8 +249,8 @@ class GenerationService:
         cites_expanded = self._add_presigned_links(footnotes)
         return {"messages": msgs, "citations": cites_expanded, "used_chunks": used_chunks, "warnings": warnings, "mode": mode}
 
-    def iter_llm_tokens(self, messages: List[Dict[str, str]]) -> Iterator[str]:
-        return self.llm_provider.stream(messages)
+    def aiter_llm_tokens(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        return self.llm_provider.astream(messages)
 
     def _parse_and_validate(self, raw: str) -> Optional[Dict[str, Any]]:
         if not raw:
@@ -162,21 +263,25 @@ class GenerationService:
             if raw.lower().startswith("json"):
                 raw = raw[4:]
             raw = raw.strip()
-        # Fast path with jsonschema if available
-        if json_validate:
-            try:
-                obj = json.loads(raw)
-                json_validate(obj, OUT_SCHEMA)
-                return obj
-            except Exception:
-                pass
+        # Fast path: the whole payload is the JSON object; no need to brace-scan it again
+        try:
+            obj = _json_loads(raw)
+        except ValueError:
+            obj = None
+        if isinstance(obj, dict):
+            if _validate_out:
+                try:
+                    _validate_out(obj)
+                except Exception:
+                    return None
+            return obj
         # Best-effort extraction
         s, e = raw.find("{"), raw.rfind("}")
         if s != -1 and e != -1 and e > s:
             try:
-                obj = json.loads(raw[s:e+1])
-                if json_validate:
-                    json_validate(obj, OUT_SCHEMA)
+                obj = _json_loads(raw[s:e+1])
+                if _validate_out:
+                    _validate_out(obj)
                 return obj
             except Exception:
                 return None
@@ -184,19 +289,22 @@ class GenerationService:
 
     def _add_presigned_links(self, citations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        Attach reliable, clickable URLs to citations.
+        Attach reliable, clickable URLs to citations, in place (callers pass freshly built lists).
         - Always set `url` to the internal proxy `/ui/open/{doc_id}` to avoid signature/host issues.
         - If presign works, also attach `direct_url` for optional external access.
         """
-        out = []
+        # one round trip for every doc's storage keys instead of one query per citation
+        try:
+            keys_by_doc = self.db.get_doc_storage_keys_bulk([c.get("doc_id") for c in citations])
+        except Exception:
+            keys_by_doc = {}
+
+        can_bucket = settings.s3_canonical_bucket
         for c in citations:
             doc_id = c.get("doc_id")
             if not doc_id:
-                out.append(c)
                 continue
 
-            # default, reliable proxy route (same-origin)
-            c2 = dict(c)
             # Build deep-link to page anchor (canonical HTML ensures id="p-<page>")
             frag = ""
             try:
@@ -205,41 +313,24 @@ class GenerationService:
                 p = None
             if p:
                 frag = f"#p-{p}"
-            c2["url"] = f"/ui/open/{doc_id}{frag}"
+            # default, reliable proxy route (same-origin)
+            c["url"] = f"/ui/open/{doc_id}{frag}"
 
             # best-effort: also provide a direct presigned link as `direct_url`
             try:
-                key = None
-                if hasattr(self.db, "get_doc_storage_keys"):
-                    keys = self.db.get_doc_storage_keys(doc_id)
-                    key = (keys or {}).get("canonical_uri") or (keys or {}).get("minio_key")
-                else:
-                    self.db.connect()
-                    with self.db.conn.cursor() as cur:
-                        cur.execute(
-                            "SELECT canonical_uri, minio_key FROM documents WHERE doc_id=%s::uuid LIMIT 1;",
-                            (doc_id,),
-                        )
-                        row = cur.fetchone()
-                    if row:
-                        key = row.get("canonical_uri") if isinstance(row, dict) else (row[0] or None)
-                        if not key:
-                            key = row.get("minio_key") if isinstance(row, dict) else row[1]
-
+                keys = keys_by_doc.get(str(doc_id)) or {}
+                key = keys.get("canonical_uri") or keys.get("minio_key")
                 if key:
-                    can_bucket = settings.s3_canonical_bucket
                     if can_bucket and (not str(key).startswith("sha256/")):
                         direct = presign(key, bucket=can_bucket)
                     else:
                         direct = presign(key)
                     if direct:
                         # attach fragment to direct URL too
-                        c2["direct_url"] = f"{direct}{frag}"
+                        c["direct_url"] = f"{direct}{frag}"
             except Exception:
                 pass
-
-            out.append(c2)
-        return out
+        return citations
 
     def process_citations(self, answer_text: str, all_footnotes: List[Dict[str, Any]], parsed_citations: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
         """
@@ -249,30 +340,24 @@ class GenerationService:
         3. Filter all_footnotes to only include used ones.
         4. Add presigned links.
         """
+        # map model citations -> full footnote payload
+        fn_map = {f["n"]: f for f in all_footnotes}
+
         # If no explicit parsed citations, extract from text
-        if not parsed_citations:
-            nums = _extract_cite_nums(answer_text)
-            parsed_citations = [{"n": n} for n in nums if any(f["n"] == n for f in all_footnotes)]
+        if not parsed_citations and "[^" in (answer_text or ""):
+            parsed_citations = [{"n": n} for n in _extract_cite_nums(answer_text) if n in fn_map]
             
             # Fallback: if still empty and we have footnotes, maybe cite the first one if it looks like a RAG answer?
             # Actually, for strict 'only used' requirements, we should return empty if none cited.
             # But existing logic was: if not parsed.get("citations"): parsed["citations"] = footnotes[:2]
             # We will adhere to strict extraction here for accuracy, but the caller can decide fallback.
-        
-        # map model citations -> full footnote payload
-        fn_map = {f["n"]: f for f in all_footnotes}
-        cleaned: List[Dict[str, int]] = []
+
+        expanded: List[Dict[str, Any]] = []
         for c in parsed_citations or []:
             try:
-                n = int(c.get("n"))
-                if n in fn_map:
-                    cleaned.append({"n": n})
+                f = fn_map.get(int(c.get("n")))
             except Exception:
                 continue
-
-        expanded: List[Dict[str, Any]] = []
-        for c in cleaned:
-            f = fn_map.get(c["n"])
             if not f:
                 continue
             expanded.append({
@@ -283,6 +368,31 @@ class GenerationService:
         
         return self._add_presigned_links(expanded)
 
+    def _maybe_total_spend(self, q: str) -> Optional[Dict[str, Any]]:
+        """Synthetic total_spend hit for spend/amount questions with a date range, else None."""
+        try:
+            # reuse the same parser via retrieval
+            if hasattr(self.retrieval, "_parse_date_range"):
+                dr = self.retrieval._parse_date_range(q)  # type: ignore
+            else:
+                dr = None
+            if not dr:
+                return None
+            start, end = dr
+            tot = self.db.total_spend(start=start, end=end)
+            return {
+                "chunk_id": f"structured:invoices:{start}:{end}",
+                "doc_id": "structured:invoices",
+                "uri": f"db://invoices?start={start}&end={end}",
+                "text": f"Structured metric: total_spend from {start} to {end} = {tot:.2f}",
+                "meta": {"types": ["metric", "table"]},
+                "page_start": 1,
+                "page_end": 1,
+                "score": 0.99,
+            }
+        except Exception:
+            return None
+
     # ---------- public API ----------
     def answer(self, q: str, *, k: int = 8, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         t0 = time.time()
@@ -305,19 +415,7 @@ class GenerationService:
                 "warnings": warnings,
             }
 
-        # route (optional) -> plan
-        if self.router and hasattr(self.router, "route"):
-            try:
-                plan = self.router.route(q, want_k=k, filters=filters) or {}
-            except Exception as e:
-                self.log("warn", "router-fail", reason=str(e))
-                plan = {}
-        else:
-            plan = {}
-        plan.setdefault("semantic_query", q)
-        plan.setdefault("k", k)
-        plan.setdefault("hybrid", True)
-        plan.setdefault("filters", filters)
+        plan = self._plan(q, k, filters)
 
         # ---------- FACT LOOKUP FAST PATH ----------
         if plan.get("intent") == "FACT_LOOKUP":
@@ -352,44 +450,18 @@ class GenerationService:
                 warnings.append("fact_fallback_rag")
 
         # ---------- RAG PATH (HYBRID BY DEFAULT) ----------
-        ret = self.retrieval.search(
-            q=plan["semantic_query"],
-            k=plan["k"],
-            hybrid=plan["hybrid"],
-            filters=plan["filters"]
-        )
-        hits = ret.get("results", [])
-
         # Structured enrichment: if query looks like spend/amount and has a date range parsed by retrieval,
-        # compute total_spend and add as a synthetic hit to ground the LLM.
-        try:
-            s = (q or "").lower()
-            wants_total = any(k in s for k in ["total spend", "spend", "amount due", "total amount", "sum of invoices"]) \
-                           or ("invoice" in s and any(k in s for k in ["total", "amount"]))
-            # reuse the same parser via retrieval
-            if hasattr(self.retrieval, "_parse_date_range"):
-                dr = self.retrieval._parse_date_range(q)  # type: ignore
-            else:
-                dr = None
-            if wants_total and dr:
-                start, end = dr
-                try:
-                    tot = self.db.total_spend(start=start, end=end)
-                    synth = {
-                        "chunk_id": f"structured:invoices:{start}:{end}",
-                        "doc_id": "structured:invoices",
-                        "uri": f"db://invoices?start={start}&end={end}",
-                        "text": f"Structured metric: total_spend from {start} to {end} = {tot:.2f}",
-                        "meta": {"types": ["metric", "table"]},
-                        "page_start": 1,
-                        "page_end": 1,
-                        "score": 0.99,
-                    }
-                    hits = [synth] + hits
-                except Exception:
-                    pass
-        except Exception:
-            pass
+        # compute total_spend and add as a synthetic hit to ground the LLM. It only needs q, so the
+        # DB query runs on the pool while retrieval runs here.
+        fut_spend = _EXEC.submit(self._maybe_total_spend, q) if _wants_total(q) else None
+        hits = self._retrieve(plan)
+        if fut_spend is not None:
+            try:
+                synth = fut_spend.result()
+            except Exception:
+                synth = None
+            if synth:
+                hits = [synth] + hits
 
         if not hits:
             # Try best-effort LLM answer with a polite limited-context disclaimer
@@ -431,9 +503,12 @@ class GenerationService:
             q, hits, token_budget=settings.gen_token_budget
         )
         mode = _intent(q)
+        ctx_has_digit = any(ch.isdigit() for ch in context_str)
+        ctx_tokens = _token_set(context_str)
+        ctx_numbers = set(_numbers_in(context_str)) if ctx_has_digit else set()
 
         # numeric guardrail (best-effort hint; do NOT override a confident model answer)
-        computed_total = _try_sum_from_context(context_str) if mode == "NUMERIC_TOTAL" else None
+        computed_total = _try_sum_from_context(context_str) if (mode == "NUMERIC_TOTAL" and ctx_has_digit) else None
 
         msgs = build_messages(q, context_str, mode)
 
@@ -485,7 +560,8 @@ class GenerationService:
         if not parsed.get("citations"):
             nums = _extract_cite_nums(parsed.get("answer", ""))
             if nums:
-                parsed["citations"] = [{"n": n} for n in nums if any(f["n"] == n for f in footnotes)]
+                known = {f["n"] for f in footnotes}
+                parsed["citations"] = [{"n": n} for n in nums if n in known]
             if not parsed.get("citations"):
                 parsed["citations"] = [{"n": f["n"]} for f in footnotes[:2]]
 
@@ -506,14 +582,14 @@ class GenerationService:
 
         # Grounding and hallucination guard
         ans_text = (parsed.get("answer", "") or "").strip()
-        gscore = _groundedness(ans_text, context_str)
+        gscore = _groundedness_vs(ans_text, ctx_tokens, ctx_numbers)
         if gscore < settings.gen_grounded_min or not expanded:
             # prepend gentle guidance once
             note = "Note: Based on limited matching context, this may be incomplete.\n\n"
             if not ans_text.startswith("## Answer"):
                 parsed["answer"] = note + ans_text
             else:
-                parsed["answer"] = re.sub(r"(##\s*Answer\s*\n)", r"\\1" + note, ans_text, count=1)
+                parsed["answer"] = _ANSWER_HDR_RX.sub(lambda m: m.group(0) + note, ans_text, count=1)
             warnings.append("low_groundedness")
 
         dt = int((time.time() - t0) * 1000)
@@ -1,14 +1,17 @@
 from __future__ import annotations
 
+import secrets
 import time
 import uuid
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from infra.db import DBClient
 
 
-def _new_id() -> str:
-    return str(uuid.uuid4())
+def _new_ids(n: int) -> Iterator[str]:
+    """n random (v4) UUID strings drawn from one urandom read instead of one per id."""
+    buf = secrets.token_bytes(16 * n)
+    return (str(uuid.UUID(bytes=buf[i:i + 16], version=4)) for i in range(0, 16 * n, 16))
 
 
 class KnowledgeGraphService:
@@ -32,19 +35,17 @@ class KnowledgeGraphService:
             )
             raise RuntimeError("no_blocks")
 
-        nodes: List[Dict[str, Any]] = []
-        edges: List[Dict[str, Any]] = []
-
-        root_id = _new_id()
-        nodes.append(
-            {
-                "node_id": root_id,
-                "doc_id": doc_id,
-                "type": "document",
-                "label": doc_id,
-                "meta": {},
-            }
-        )
+        # Positional rows in replace_graph column order (no per-row dicts):
+        # nodes (node_id, doc_id, type, label, meta); edges (edge_id, doc_id, src, dst, rel_type, weight, meta)
+        nodes: List[Tuple] = []
+        edges: List[Tuple] = []
+        contains_meta = {"source": "structure"}
+        follows_meta = {"source": "sequence"}
+
+        # root + per block: node, "contains" edge, "follows" edge
+        ids = _new_ids(1 + 3 * len(blocks))
+        root_id = next(ids)
+        nodes.append((root_id, doc_id, "document", doc_id, {}))
 
         header_stack: List[Tuple[int, str]] = []
         previous_node: Optional[str] = None
@@ -56,7 +57,7 @@ class KnowledgeGraphService:
             if not label:
                 label = f"{btype.title()}@{block.get('page') or 0}"
 
-            node_id = _new_id()
+            node_id = next(ids)
             node_meta = {
                 "page": block.get("page"),
                 "span": [block.get("span_start"), block.get("span_end")],
@@ -64,21 +65,13 @@ class KnowledgeGraphService:
                 "headers": meta.get("headers"),
                 "origin_type": btype,
             }
-
-            nodes.append(
-                {
-                    "node_id": node_id,
-                    "doc_id": doc_id,
-                    "type": btype,
-                    "label": label,
-                    "meta": node_meta,
-                }
-            )
+            nodes.append((node_id, doc_id, btype, label, node_meta))
 
             parent_id = root_id
             if btype == "header":
                 level = int(meta.get("level") or 1)
-                header_stack = [item for item in header_stack if item[0] < level]
+                while header_stack and header_stack[-1][0] >= level:
+                    header_stack.pop()
                 if header_stack:
                     parent_id = header_stack[-1][1]
                 header_stack.append((level, node_id))
@@ -86,30 +79,10 @@ class KnowledgeGraphService:
                 if header_stack:
                     parent_id = header_stack[-1][1]
 
-            edges.append(
-                {
-                    "edge_id": _new_id(),
-                    "doc_id": doc_id,
-                    "src_node_id": parent_id,
-                    "dst_node_id": node_id,
-                    "rel_type": "contains",
-                    "weight": None,
-                    "meta": {"source": "structure"},
-                }
-            )
+            edges.append((next(ids), doc_id, parent_id, node_id, "contains", None, contains_meta))
 
             if previous_node:
-                edges.append(
-                    {
-                        "edge_id": _new_id(),
-                        "doc_id": doc_id,
-                        "src_node_id": previous_node,
-                        "dst_node_id": node_id,
-                        "rel_type": "follows",
-                        "weight": None,
-                        "meta": {"source": "sequence"},
-                    }
-                )
+                edges.append((next(ids), doc_id, previous_node, node_id, "follows", None, follows_meta))
 
             previous_node = node_id
 
@@ -1,6 +1,9 @@
 from __future__ import annotations
-import hashlib, binascii, tempfile, mimetypes, time, os
-from typing import List, Optional, Tuple
+import hashlib, binascii, tempfile, mimetypes, threading, time, os, re, zlib
+from collections import OrderedDict
+from functools import lru_cache
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
 from fastapi import UploadFile
 
 from core.models import IngestResponseItem, StoredResult, new_uuid
@@ -8,51 +11,163 @@ from infra.db import DBClient
 from infra.minio_store import MinioStore
 from core.config import settings
 
+# Content hashing for dedupe/blob keys. hashlib.sha256 is OpenSSL-backed and dispatches to
+# SHA-NI / AVX2 at runtime, so the factory is the one place to swap in another hasher.
+_sha256_factory = hashlib.sha256
 
-def compute_hashes_to_tmp(upload: UploadFile, chunk_size: int = 1_048_576) -> Tuple[str, str, int, str]:
+# soft-dep: libdeflate (pip `deflate`) folds CRC-32 with PCLMULQDQ; same zlib polynomial, so the
+# stored crc32 values do not change. Sanity-checked against binascii before it is trusted.
+# Fallback is zlib.crc32 rather than binascii's, which only drops the GIL when CPython was built
+# against zlib; zlib.crc32 always releases it on large buffers, so hashing threads overlap.
+_crc32 = zlib.crc32
+try:
+    import deflate as _deflate  # type: ignore
+    if _deflate.crc32(b"123456789", 0) == binascii.crc32(b"123456789"):
+        _crc32 = _deflate.crc32
+except Exception:
+    pass
+
+
+# libmagic never looks past its bytes_max (1 MiB by default), so a head of that size sniffs
+# the same MIME as the whole file without reading it back from disk.
+_MIME_HEAD_BYTES = 1_048_576
+
+
+def _hash_chunks(chunks: Iterable, dst=None) -> Tuple[str, str, int, bytes]:
     """
-    Stream the UploadFile to a temp file, computing sha256 and crc32.
-    Returns: (tmp_path, sha256_hex, crc32_hex, size_bytes)
+    One pass over an iterable of byte chunks: sha256 + crc32 (+ copy to `dst` if given)
+    on the same buffer; hashlib/zlib release the GIL on large updates.
+    Also keeps the first _MIME_HEAD_BYTES for MIME sniffing.
+    Returns: (sha256_hex, crc32_hex, size_bytes, head)
     """
-    h = hashlib.sha256()
+    h = _sha256_factory()
     crc = 0
     size = 0
-    tmp = tempfile.NamedTemporaryFile(delete=False)
-    try:
+    head = bytearray()
+    for chunk in chunks:
+        n = len(chunk)
+        if not n:
+            continue
+        h.update(chunk)
+        crc = _crc32(chunk, crc)
+        if size < _MIME_HEAD_BYTES:
+            head += chunk[:_MIME_HEAD_BYTES - size]
+        size += n
+        if dst is not None:
+            dst.write(chunk)
+    return h.hexdigest(), (crc & 0xFFFFFFFF).to_bytes(4, "big").hex(), size, bytes(head)
+
+
+def _read_chunks(src, chunk_size: int):
+    """Yield chunks from a file object, reusing one buffer when it supports readinto."""
+    readinto = getattr(src, "readinto", None)
+    if readinto is None:
         while True:
-            chunk = upload.file.read(chunk_size)
+            chunk = src.read(chunk_size)
             if not chunk:
-                break
-            h.update(chunk)
-            crc = binascii.crc32(chunk, crc)
-            size += len(chunk)
-            tmp.write(chunk)
-    finally:
-        tmp.flush()
+                return
+            yield chunk
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    while True:
+        n = readinto(buf)
+        if not n:
+            return
+        yield view[:n]
+
+
+def _hash_stream(src, dst=None, chunk_size: int = 1_048_576) -> Tuple[str, str, int, bytes]:
+    """
+    _hash_chunks over a file object. Reads into a single reused buffer when the source
+    supports readinto, so no per-chunk bytes objects are allocated.
+    """
+    return _hash_chunks(_read_chunks(src, chunk_size), dst)
+
+
+def _unlink_quiet(path: str) -> None:
+    """Remove a temp file we own; a missing file is not an error."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def compute_hashes_to_tmp(upload: UploadFile, chunk_size: int = 1_048_576) -> Tuple[str, str, str, int, bytes]:
+    """
+    Stream the UploadFile to a temp file, computing sha256 and crc32.
+    Returns: (tmp_path, sha256_hex, crc32_hex, size_bytes, head) where head is the file's
+    first bytes for detect_mime_from_buffer.
+    """
+    tmp = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        sha256_hex, crc32_hex, size, head = _hash_stream(upload.file, tmp, chunk_size)
+    except BaseException:
         tmp.close()
-        upload.file.seek(0)  # rewind for safety (not needed further, but good hygiene)
-    sha256_hex = h.hexdigest()
-    crc32_hex = format(crc & 0xFFFFFFFF, "08x")
-    return tmp.name, sha256_hex, crc32_hex, size
+        _unlink_quiet(tmp.name)
+        raise
+    tmp.close()
+    return tmp.name, sha256_hex, crc32_hex, size, head
+
+
+def compute_hashes_in_memory(upload: UploadFile, limit_bytes: int) -> Optional[Tuple[bytes, str, str, int]]:
+    """
+    Small uploads of known size: read into memory and hash there, skipping the temp file.
+    Returns (data, sha256_hex, crc32_hex, size_bytes), or None if the size is unknown or over the limit.
+    """
+    size_hint = getattr(upload, "size", None)
+    if size_hint is None or size_hint > limit_bytes:
+        return None
+    data = upload.file.read()
+    sha256_hex = _sha256_factory(data).hexdigest()
+    crc32_hex = (_crc32(data, 0) & 0xFFFFFFFF).to_bytes(4, "big").hex()
+    return data, sha256_hex, crc32_hex, len(data)
+
+
+def _mime_suffix(name: str) -> str:
+    """The part of a filename mimetypes.guess_type looks at: the last extension, plus the one
+    before it when the last is an encoding (".tar.gz"). Case is kept, as guess_type keeps it."""
+    base, ext = os.path.splitext(name)
+    if ext in mimetypes.encodings_map or ext.lower() in mimetypes.encodings_map:
+        ext = os.path.splitext(base)[1] + ext
+    return ext
+
+
+@lru_cache(maxsize=4096)
+def _ext_to_mime(ext: str) -> Optional[str]:
+    """mimetypes guess for a _mime_suffix() result (".pdf", ".tar.gz"), memoized per suffix."""
+    return mimetypes.guess_type("x" + ext)[0] if ext else None
 
 
 def guess_mime(upload: UploadFile) -> str:
     # prefer provided content type; else guess from filename; fallback to octet-stream
     if upload.content_type and upload.content_type != "application/octet-stream":
         return upload.content_type
-    mt, _ = mimetypes.guess_type(upload.filename or "")
+    mt = _ext_to_mime(_mime_suffix(upload.filename or ""))
     return mt or "application/octet-stream"
 
 
-def detect_mime_from_file(tmp_path: str, fallback: str) -> str:
-    """Try to detect MIME using python-magic from actual bytes; fallback to provided value."""
-    try:
+# libmagic handles load the whole magic database; keep one per worker thread (a shared one
+# serialises callers on its internal lock) instead of building one per file.
+_magic_local = threading.local()
+
+
+def _magic_handle():
+    m = getattr(_magic_local, "handle", None)
+    if m is None:
         import magic  # type: ignore
+        m = magic.Magic(mime=True)  # type: ignore
+        _magic_local.handle = m
+    return m
+
+
+def detect_mime_from_buffer(data: bytes, fallback: str) -> str:
+    """Try to detect MIME using python-magic from the file's leading bytes; fallback to provided value."""
+    try:
         try:
-            m = magic.Magic(mime=True)  # type: ignore
-            mt = m.from_file(tmp_path)
+            mt = _magic_handle().from_buffer(data)
         except Exception:
-            mt = magic.from_file(tmp_path, mime=True)  # type: ignore
+            import magic  # type: ignore
+            mt = magic.from_buffer(data, mime=True)  # type: ignore
         if mt and isinstance(mt, str):
             return mt
     except Exception:
@@ -60,6 +175,83 @@ def detect_mime_from_file(tmp_path: str, fallback: str) -> str:
     return fallback
 
 
+# hostname -> (expiry, is_safe) for the SSRF guard, so webhook fan-out from one upstream
+# doesn't pay a DNS round-trip per URL. Resolution failures are not cached.
+_HOST_SAFETY_CACHE_MAX = 1024
+_HOST_SAFETY_CACHE_TTL_S = 60.0
+_host_safety_cache: "OrderedDict[str, Tuple[float, bool]]" = OrderedDict()
+_host_safety_cache_lock = threading.Lock()
+
+
+def _is_safe_url(url: str) -> bool:
+    import socket
+    import ipaddress
+    from urllib.parse import urlparse
+
+    try:
+        parsed = urlparse(url)
+        hostname = parsed.hostname
+        if not hostname:
+            return False
+        host_key = hostname.lower()
+        now = time.monotonic()
+        with _host_safety_cache_lock:
+            item = _host_safety_cache.get(host_key)
+            if item is not None and item[0] > now:
+                _host_safety_cache.move_to_end(host_key)
+                return item[1]
+
+        # resolve every A/AAAA record; one private address is enough to refuse the host
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        infos = socket.getaddrinfo(hostname, port, type=socket.SOCK_STREAM)
+        if not infos:
+            return False
+        safe = True
+        for info in infos:
+            ip_obj = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+            mapped = getattr(ip_obj, "ipv4_mapped", None)
+            if mapped is not None:
+                ip_obj = mapped
+            # block private, loopback, link-local, multicast
+            if (ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_link_local or
+                    ip_obj.is_multicast or ip_obj.is_reserved or ip_obj.is_unspecified):
+                safe = False
+                break
+        with _host_safety_cache_lock:
+            _host_safety_cache[host_key] = (now + _HOST_SAFETY_CACHE_TTL_S, safe)
+            _host_safety_cache.move_to_end(host_key)
+            while len(_host_safety_cache) > _HOST_SAFETY_CACHE_MAX:
+                _host_safety_cache.popitem(last=False)
+        return safe
+    except Exception:
+        return False
+
+
+def _check_request_target(request) -> None:
+    """httpx request hook: runs for every hop, so redirects get the same SSRF check as the URL."""
+    if not _is_safe_url(str(request.url)):
+        raise ValueError(f"unsafe_url_target: {request.url.host}")
+
+
+@lru_cache(maxsize=1)
+def _http_client():
+    """
+    Shared keep-alive client for URL ingests (httpx comes in with the openai SDK), so repeated
+    downloads from the same upstream reuse TCP/TLS connections. HTTP/2 only if h2 is installed.
+    """
+    import httpx
+    try:
+        import h2  # type: ignore  # noqa: F401
+        http2 = True
+    except Exception:
+        http2 = False
+    return httpx.Client(
+        http2=http2, timeout=30, follow_redirects=True,
+        limits=httpx.Limits(max_keepalive_connections=32),
+        event_hooks={"request": [_check_request_target]},
+    )
+
+
 class IngestionService:
     def __init__(
         self,
@@ -77,13 +269,17 @@ class IngestionService:
         self.tenant_id = tenant_id
         self.log = logger
         self.allowed_mime_prefixes = allowed_mime_prefixes or []
+        # one anchored alternation instead of a startswith() scan per file
+        self._allowed_mime_rx = (
+            re.compile("|".join(re.escape(p) for p in self.allowed_mime_prefixes))
+            if self.allowed_mime_prefixes else None
+        )
         self.max_file_mb = max_file_mb
         self.max_files_per_request = max_files_per_request
         # additional guards
         self.max_filename_len = settings.ingest_max_filename_len
-        self.disallowed_exts = set(
-            (settings.ingest_disallowed_exts or "")
-            .lower().split(",")
+        self.disallowed_exts = frozenset(
+            e for e in (settings.ingest_disallowed_exts or "").lower().split(",") if e
         )
 
         # Strict mode: when true, reject files on extension/mime/size/filename policy violations.
@@ -118,22 +314,46 @@ class IngestionService:
 
         from concurrent.futures import ThreadPoolExecutor
         
-        def _process_one(upload: UploadFile) -> IngestResponseItem:
+        # Events are buffered per request (timestamped when raised) and written in one batch
+        # once the pool drains, instead of one round trip each.
+        events: List[tuple] = []
+
+        def _event(*, stage: str, status: str, details: dict, doc_id: Optional[str] = None) -> None:
+            events.append((stage, status, details, doc_id, datetime.now(timezone.utc)))
+
+        inmem_limit = max(0, settings.ingest_inmem_max_mb) * 1024 * 1024
+        # {sha256: doc_id} from one batch lookup once hashing is done; None -> per-file lookups
+        existing_by_sha: Optional[dict] = None
+
+        def _hash_stage(upload: UploadFile):
+            """Hash + sniff one upload. Errors are returned, and reported by _process_one."""
             t0 = time.time()
+            try:
+                # Small uploads stay in memory; larger ones are spooled to a temp file
+                # (compute_hashes_to_tmp is I/O bound on disk write)
+                mem = compute_hashes_in_memory(upload, inmem_limit)
+                if mem is not None:
+                    data, sha256_hex, crc32_hex, size = mem
+                    return t0, data, None, sha256_hex, crc32_hex, size, detect_mime_from_buffer(data, guess_mime(upload))
+                tmp_path, sha256_hex, crc32_hex, size, head = compute_hashes_to_tmp(upload)
+                return t0, None, tmp_path, sha256_hex, crc32_hex, size, detect_mime_from_buffer(head, guess_mime(upload))
+            except Exception as e:
+                return e
+
+        def _process_one(upload: UploadFile, staged) -> IngestResponseItem:
             fname = upload.filename or "unnamed"
+            tmp_path = None
             try:
-                # Note: compute_hashes_to_tmp is I/O bound on disk write
-                tmp_path, sha256_hex, crc32_hex, size = compute_hashes_to_tmp(upload)
-                mime = detect_mime_from_file(tmp_path, guess_mime(upload))
+                if isinstance(staged, Exception):
+                    raise staged
+                t0, data, tmp_path, sha256_hex, crc32_hex, size, mime = staged
                 file_warnings: list[str] = []
                 # ---- filename sanity ----
                 if len(fname) > self.max_filename_len:
-                    self.db.insert_event(self.tenant_id, stage="STORED", status="WARN", details={
+                    _event(stage="STORED", status="WARN", details={
                         "event": "DOC_REJECTED_FILENAME_LEN", "filename": fname, "limit": self.max_filename_len
                     })
                     if self.strict_mode:
-                        try: os.remove(tmp_path)
-                        except Exception: pass
                         return IngestResponseItem(
                             tenant_id=self.tenant_id, doc_id=None, sha256="", state="REJECTED",
                             size_bytes=size, mime=mime, uri=source_uri or fname, duplicate=False,
@@ -146,12 +366,10 @@ class IngestionService:
                 # ---- suspicious extensions ----
                 ext = os.path.splitext(fname)[1].lower()
                 if ext and ext in self.disallowed_exts:
-                    self.db.insert_event(self.tenant_id, stage="STORED", status="WARN", details={
+                    _event(stage="STORED", status="WARN", details={
                         "event": "DOC_REJECTED_EXTENSION", "filename": fname, "ext": ext
                     })
                     if self.strict_mode:
-                        try: os.remove(tmp_path)
-                        except Exception: pass
                         return IngestResponseItem(
                             tenant_id=self.tenant_id, doc_id=None, sha256="", state="REJECTED",
                             size_bytes=size, mime=mime, uri=source_uri or fname, duplicate=False,
@@ -165,11 +383,9 @@ class IngestionService:
                 max_bytes = self.max_file_mb * 1024 * 1024
                 # reject empty files
                 if size == 0:
-                    self.db.insert_event(self.tenant_id, stage="STORED", status="WARN", details={
+                    _event(stage="STORED", status="WARN", details={
                         "event": "DOC_REJECTED_EMPTY", "filename": fname, "mime": mime
                     })
-                    try: os.remove(tmp_path)
-                    except Exception: pass
                     self.log("warn", "ingest-reject-empty", stage="STORED", filename=fname, mime=mime)
                     return IngestResponseItem(
                         tenant_id=self.tenant_id, doc_id=None, sha256="", state="REJECTED",
@@ -178,7 +394,7 @@ class IngestionService:
                     )
 
                 if size > max_bytes:
-                    self.db.insert_event(self.tenant_id, stage="STORED", status="WARN", details={
+                    _event(stage="STORED", status="WARN", details={
                         "event": "DOC_REJECTED_OVERSIZE",
                         "size_bytes": size,
                         "limit_bytes": max_bytes,
@@ -186,8 +402,6 @@ class IngestionService:
                         "mime": mime,
                     })
                     if self.strict_mode:
-                        try: os.remove(tmp_path)
-                        except Exception: pass
                         self.log("warn", "ingest-reject-oversize", stage="STORED", filename=fname, size_bytes=size, limit=max_bytes)
                         return IngestResponseItem(
                             tenant_id=self.tenant_id,
@@ -207,16 +421,14 @@ class IngestionService:
                         file_warnings.append(f"file too large: {size} > {max_bytes}")
 
                 # ---- per-file MIME allowlist ----
-                if self.allowed_mime_prefixes and not any(mime.startswith(pfx) for pfx in self.allowed_mime_prefixes):
-                    self.db.insert_event(self.tenant_id, stage="STORED", status="WARN", details={
+                if self._allowed_mime_rx is not None and not self._allowed_mime_rx.match(mime):
+                    _event(stage="STORED", status="WARN", details={
                         "event": "DOC_REJECTED_MIME",
                         "mime": mime,
                         "allowed": self.allowed_mime_prefixes,
                         "filename": fname,
                     })
                     if self.strict_mode:
-                        try: os.remove(tmp_path)
-                        except Exception: pass
                         self.log("warn", "ingest-reject-mime", stage="STORED", filename=fname, mime=mime, allowed=self.allowed_mime_prefixes)
                         return IngestResponseItem(
                             tenant_id=self.tenant_id,
@@ -236,10 +448,13 @@ class IngestionService:
                         file_warnings.append(f"disallowed mime: {mime}")
 
                 # dedupe
-                existing_doc = self.db.find_doc_by_hash(self.tenant_id, sha256_hex)
+                if existing_by_sha is not None:
+                    existing_doc = existing_by_sha.get(sha256_hex)
+                else:
+                    existing_doc = self.db.find_doc_by_hash(self.tenant_id, sha256_hex)
                 if existing_doc:
                     # event: DOC_DUPLICATE
-                    self.db.insert_event(self.tenant_id, stage="STORED", status="INFO", details={
+                    _event(stage="STORED", status="INFO", details={
                         "event": "DOC_DUPLICATE",
                         "sha256": sha256_hex,
                         "uri": source_uri or fname,
@@ -247,8 +462,6 @@ class IngestionService:
                         "size_bytes": size
                     }, doc_id=existing_doc)
 
-                    try: os.remove(tmp_path)
-                    except Exception: pass
                     
                     self.log("info", "ingest-duplicate", stage="STORED", sha256=sha256_hex, filename=fname,
                              mime=mime, size_bytes=size, latency_ms=int((time.time()-t0)*1000))
@@ -268,7 +481,10 @@ class IngestionService:
                     )
 
                 # upload to MinIO
-                key = self.store.put_file(sha256_hex, tmp_path, size, mime)
+                if data is not None:
+                    key = self.store.put_bytes(sha256_hex, data, size, mime)
+                else:
+                    key = self.store.put_file(sha256_hex, tmp_path, size, mime)
                 self.db.upsert_blob(sha256=sha256_hex, location=key, crc32=crc32_hex)
 
                 # insert document
@@ -281,7 +497,7 @@ class IngestionService:
                 )
 
                 # event: DOC_STORED
-                self.db.insert_event(self.tenant_id, stage="STORED", status="OK", details={
+                _event(stage="STORED", status="OK", details={
                     "event": "DOC_STORED",
                     "sha256": sha256_hex,
                     "uri": source_uri or fname,
@@ -295,10 +511,10 @@ class IngestionService:
                 # quick checkers
                 warnings = []
                 # MIME vs extension
-                mt_guess, _ = mimetypes.guess_type(fname)
+                mt_guess = _ext_to_mime(_mime_suffix(fname))
                 if mt_guess and mt_guess != mime:
                     warn_msg = f"mime_extension_mismatch: ext_guess={mt_guess} provided={mime}"
-                    self.db.insert_event(self.tenant_id, stage="CHECKER", status="WARN", details={
+                    _event(stage="CHECKER", status="WARN", details={
                         "checker": "mime_extension_mismatch",
                         "message": warn_msg,
                         "context": {"filename": fname, "ext_guess": mt_guess, "provided": mime}
@@ -310,7 +526,7 @@ class IngestionService:
                     st = self.store.stat(key)
                     if st.size != size:
                         warn_msg = f"blob_size_mismatch: minio={st.size} computed={size}"
-                        self.db.insert_event(self.tenant_id, stage="CHECKER", status="WARN", details={
+                        _event(stage="CHECKER", status="WARN", details={
                             "checker": "blob_size_mismatch",
                             "message": warn_msg,
                             "context": {"minio_size": st.size, "computed_size": size, "key": key}
@@ -318,7 +534,7 @@ class IngestionService:
                         warnings.append(warn_msg)
                 except Exception as e:
                     warn_msg = f"blob_stat_failed: {e}"
-                    self.db.insert_event(self.tenant_id, stage="CHECKER", status="WARN", details={
+                    _event(stage="CHECKER", status="WARN", details={
                         "checker": "blob_stat_failed",
                         "message": str(e),
                         "context": {"key": key}
@@ -343,7 +559,7 @@ class IngestionService:
                 )
 
             except Exception as e:
-                self.db.insert_event(self.tenant_id, stage="STORED", status="FAIL", details={
+                _event(stage="STORED", status="FAIL", details={
                     "event": "DOC_STORE_FAIL", "error": str(e), "filename": fname
                 }, doc_id=None)
                 self.log("error", "ingest-fail", stage="STORED", filename=fname, error=str(e))
@@ -355,48 +571,65 @@ class IngestionService:
                 )
 
             finally:
-                # clean temp file if exists
-                try:
-                    if 'tmp_path' in locals() and os.path.exists(tmp_path):
-                        os.remove(tmp_path)
-                except Exception as cleanup_err:
-                     self.log("warn", "cleanup-failed", path=tmp_path, error=str(cleanup_err))
+                # the staged temp file (if any) is owned here and removed exactly once
+                if tmp_path:
+                    try:
+                        _unlink_quiet(tmp_path)
+                    except Exception as cleanup_err:
+                        self.log("warn", "cleanup-failed", path=tmp_path, error=str(cleanup_err))
 
         # Execute in parallel
         # We use min(len(uploads), 8) threads to prevent overwhelming disk I/O
         with ThreadPoolExecutor(max_workers=min(len(uploads), 8)) as executor:
-            results = list(executor.map(_process_one, uploads))
+            staged = list(executor.map(_hash_stage, uploads))
+            # one dedupe lookup for the whole batch instead of one per file
+            try:
+                existing_by_sha = self.db.find_docs_by_hashes(
+                    self.tenant_id, [st[3] for st in staged if not isinstance(st, Exception)]
+                )
+            except Exception as e:
+                self.log("warn", "ingest-dedupe-batch-failed", error=str(e))
+                existing_by_sha = None  # per-file lookups
+            # Repeat copies of one file in the same batch wait for the first copy, so they come
+            # back as its duplicates instead of racing it into uq_documents_tenant_sha.
+            first_seen: Dict[str, int] = {}
+            repeats: List[int] = []
+            for i, st in enumerate(staged):
+                if isinstance(st, Exception):
+                    continue
+                if st[3] in first_seen:
+                    repeats.append(i)
+                else:
+                    first_seen[st[3]] = i
+            results: List[Optional[IngestResponseItem]] = [None] * len(uploads)
+            run = lambda i: _process_one(uploads[i], staged[i])
+            repeat_set = set(repeats)
+            leads = [i for i in range(len(uploads)) if i not in repeat_set]
+            for i, res in zip(leads, executor.map(run, leads)):
+                results[i] = res
+            if repeats:
+                if existing_by_sha is not None:
+                    for sha, i in first_seen.items():
+                        if results[i].doc_id and sha not in existing_by_sha:
+                            existing_by_sha[sha] = results[i].doc_id
+                for i, res in zip(repeats, executor.map(run, repeats)):
+                    results[i] = res
+
+        try:
+            self.db.insert_events_bulk(self.tenant_id, events)
+        except Exception as e:
+            self.log("warn", "ingest-events-flush-failed", count=len(events), error=str(e))
         
         return results
 
     def _is_safe_url(self, url: str) -> bool:
-        import socket
-        import ipaddress
-        from urllib.parse import urlparse
-
-        try:
-            parsed = urlparse(url)
-            hostname = parsed.hostname
-            if not hostname:
-                return False
-            # resolve
-            ip = socket.gethostbyname(hostname)
-            ip_obj = ipaddress.ip_address(ip)
-            
-            # block private, loopback, link-local, multicast
-            if (ip_obj.is_private or ip_obj.is_loopback or 
-                ip_obj.is_link_local or ip_obj.is_multicast or ip_obj.is_reserved):
-                return False
-            return True
-        except Exception:
-            return False
+        return _is_safe_url(url)
 
     def ingest_from_url(self, url: str, source: Optional[str] = None) -> IngestResponseItem:
         """
         Download a file from a URL to a temp file and ingest it.
         Useful for n8n/Zapier integrations.
         """
-        import requests
         import shutil
         from urllib.parse import urlparse
 
@@ -417,37 +650,20 @@ class IngestionService:
         # Download to temp
         tmp = tempfile.NamedTemporaryFile(delete=False)
         try:
-            with requests.get(url, stream=True, timeout=30) as r:
+            # hash while downloading, so the temp file is written once and never re-read
+            with _http_client().stream("GET", url) as r:
                 r.raise_for_status()
-                for chunk in r.iter_content(chunk_size=8192):
-                    tmp.write(chunk)
+                sha256_hex, crc32_hex, size, head = _hash_chunks(
+                    r.iter_bytes(chunk_size=1_048_576), tmp
+                )
             tmp.close() # finish write
             
-            # Re-open as a file-like object to reuse existing logic logic or just compute hashes directly
-            # For DRY, let's just reuse the logic parts manually since we don't have an UploadFile
-            
-            # Compute hashes from the temp file on disk
-            h = hashlib.sha256()
-            crc = 0
-            size = 0
-            with open(tmp.name, "rb") as f:
-                while True:
-                    chunk = f.read(1_048_576)
-                    if not chunk: break
-                    h.update(chunk)
-                    crc = binascii.crc32(chunk, crc)
-                    size += len(chunk)
-            
-            sha256_hex = h.hexdigest()
-            crc32_hex = format(crc & 0xFFFFFFFF, "08x")
-            
             # MIME
-            mime = detect_mime_from_file(tmp.name, "application/octet-stream")
+            mime = detect_mime_from_buffer(head, "application/octet-stream")
             
             # Check dupes
             existing_doc = self.db.find_doc_by_hash(self.tenant_id, sha256_hex)
             if existing_doc:
-                os.remove(tmp.name)
                 return IngestResponseItem(
                     tenant_id=self.tenant_id, doc_id=existing_doc, sha256=sha256_hex,
                     state="STORED", size_bytes=size, mime=mime, uri=url, duplicate=True,
@@ -480,8 +696,6 @@ class IngestionService:
             )
 
         except Exception as e:
-            try: os.remove(tmp.name)
-            except: pass
             self.log("error", "ingest-url-fail", url=url, error=str(e))
             return IngestResponseItem(
                 tenant_id=self.tenant_id, doc_id=None, sha256="", state="ERROR",
@@ -491,7 +705,6 @@ class IngestionService:
 
         finally:
             try:
-                if 'tmp' in locals() and os.path.exists(tmp.name):
-                    os.remove(tmp.name)
+                _unlink_quiet(tmp.name)
             except Exception as cleanup_err:
-                 self.log("warn", "cleanup-failed", path=tmp.name, error=str(cleanup_err))
\ No newline at end of file
+                self.log("warn", "cleanup-failed", path=tmp.name, error=str(cleanup_err))
\ No newline at end of file
@@ -1,49 +1,81 @@
 from typing import List, Dict, Any, Tuple, Optional
-import math
+from itertools import zip_longest
+from collections import defaultdict
+from types import MappingProxyType
 import re
 from core.config import settings
 
+# Read-only stand-in for a hit without meta, so lookups don't allocate a fresh {} each time.
+_EMPTY_META = MappingProxyType({})
+
+# Numeric-intent cue words for pack_context. Substring match, like the old `w in q.lower()`
+# scan ("fees"/"subtotal" are covered by "fee"/"total").
+_NUMERIC_RE = re.compile(r"total|amount|sum|balance|fee|tax", re.IGNORECASE)
+
 def _to_int_or_none(v):
-    try:
-        if v is None: return None
-        if isinstance(v, int): return v
-        if isinstance(v, float) and v.is_integer(): return int(v)
-        if isinstance(v, str) and v.strip().isdigit(): return int(v.strip())
-    except Exception: pass
+    if type(v) is int: return v
+    if v is None: return None
+    if isinstance(v, int): return v
+    if isinstance(v, float): return int(v) if v.is_integer() else None
+    if isinstance(v, str):
+        s = v.strip()
+        # isdecimal, not isdigit: int() rejects superscripts and other non-decimal digits
+        return int(s) if s.isdecimal() else None
     return None
 
+_PAGE_KEYS = ("page_start", "page", "p", "pg")
+
 def _page_from_hit(hit: dict) -> int:
-    m = (hit.get("meta") or {})
-    for key in ("page_start", "page", "p", "pg"):
-        p = _to_int_or_none(hit.get(key)) or _to_int_or_none(m.get(key))
+    m = (hit.get("meta") or _EMPTY_META)
+    for key in _PAGE_KEYS:
+        v = hit.get(key)
+        p = _to_int_or_none(v) if v is not None else None
+        if not p:
+            v = m.get(key)
+            p = _to_int_or_none(v) if v is not None else None
         if p is not None: return p
     return 1
 
 def _estimated_tokens(text: str) -> int:
-    return max(1, math.ceil(len(text or "") / 4))
+    # ceil(len/4) without the float round-trip
+    return ((len(text or "") + 3) >> 2) or 1
+
+def _flush(cur: Optional[Dict[str, Any]]) -> None:
+    """Finalize a stitched block: join its text parts once instead of += per hit."""
+    if cur is not None and "text_parts" in cur:
+        parts = cur.pop("text_parts")
+        cur.pop("_len", None)
+        cur["text"] = parts[0] if len(parts) == 1 else "\n".join(parts)
 
 def stitch_hits(hits: List[Dict[str, Any]], max_chars: int = 2000) -> List[Dict[str, Any]]:
     if not hits: return []
     out: List[Dict[str, Any]] = []
     cur = None
     for h in hits:
-        txt = (h.get("text") or "").strip()
+        txt = h.get("text")
         if not txt: continue
+        # most chunk text is already trimmed; only strip (and copy) when it isn't
+        if txt[0].isspace() or txt[-1].isspace():
+            txt = txt.strip()
+            if not txt: continue
         doc = h.get("doc_id")
         p1 = _page_from_hit(h)
         p2 = _to_int_or_none(h.get("page_end")) or p1
         if cur and cur["doc_id"] == doc:
             prev_end = _to_int_or_none(cur.get("page_end")) or cur["page_start"]
             if (p1 - prev_end) in (0, 1):
-                if len(cur["text"]) + 1 + len(txt) <= max_chars:
-                    cur["text"] += "\n" + txt
+                if cur["_len"] + 1 + len(txt) <= max_chars:
+                    cur["text_parts"].append(txt)
+                    cur["_len"] += 1 + len(txt)
                     cur["page_end"] = max(cur["page_end"], p2)
                     cur["chunk_ids"].append(h.get("chunk_id"))
                     continue
+        _flush(cur)
         cur = {
             "doc_id": doc,
             "chunk_ids": [h.get("chunk_id")],
-            "text": txt,
+            "text_parts": [txt],
+            "_len": len(txt),
             "uri": h.get("uri") or h.get("canonical_uri") or "",
             "page_start": p1,
             "page_end": p2,
@@ -51,13 +83,16 @@ def stitch_hits(hits: List[Dict[str, Any]], max_chars: int = 2000) -> List[Dict[
             "score": h.get("score")
         }
         out.append(cur)
+    _flush(cur)
     return out
 
 def pack_context(q: str, hits: List[Dict[str, Any]], token_budget: int = 3500) -> Tuple[str, List[Dict[str, Any]], List[str]]:
     # Prefer tables/lists for numeric queries
-    def _types(h): return ((h.get("meta") or {}).get("types") or [])
-    if any(w in (q or "").lower() for w in ["total", "amount", "sum", "balance", "fee", "fees", "tax", "subtotal"]):
-        hits = sorted(hits, key=lambda h: ("table" in _types(h) or "list" in _types(h), h.get("score", 0.0)), reverse=True)
+    def _numeric_key(h):
+        types = (h.get("meta") or _EMPTY_META).get("types") or []
+        return ("table" in types or "list" in types, h.get("score", 0.0))
+    if q and _NUMERIC_RE.search(q):
+        hits = sorted(hits, key=_numeric_key, reverse=True)
 
     by_doc: Dict[str, List[Dict[str, Any]]] = {}
     for h in hits:
@@ -65,15 +100,10 @@ def pack_context(q: str, hits: List[Dict[str, Any]], token_budget: int = 3500) -
     for v in by_doc.values():
         v.sort(key=lambda x: float(x.get("score", 0.0)), reverse=True)
 
-    ordered: List[Dict[str, Any]] = []
-    while True:
-        moved = False
-        for arr in by_doc.values():
-            if arr:
-                ordered.append(arr.pop(0))
-                moved = True
-        if not moved:
-            break
+    # round-robin across docs: best of each doc, then second-best of each, ...
+    ordered: List[Dict[str, Any]] = [
+        h for group in zip_longest(*by_doc.values()) for h in group if h is not None
+    ]
 
     stitched = stitch_hits(ordered, max_chars=2000)
 
@@ -85,14 +115,16 @@ def pack_context(q: str, hits: List[Dict[str, Any]], token_budget: int = 3500) -
     used: List[str] = []
 
     per_doc_cap = settings.gen_max_stitch_per_doc
-    used_per_doc: Dict[str, int] = {}
+    # decided once: with no cap there is nothing to count per doc
+    capped = per_doc_cap > 0
+    used_per_doc: Dict[str, int] = defaultdict(int)
     t, n = 0, 1
     for h in stitched:
         txt = (h.get("text") or "").strip()
         if not txt: continue
-        did = str(h.get("doc_id"))
-        if per_doc_cap > 0 and did:
-            if used_per_doc.get(did, 0) >= per_doc_cap:
+        if capped:
+            did = str(h.get("doc_id"))
+            if used_per_doc[did] >= per_doc_cap:
                 continue
         trimmed = txt[:8000]
         tok = _estimated_tokens(trimmed) + 20
@@ -102,7 +134,8 @@ def pack_context(q: str, hits: List[Dict[str, Any]], token_budget: int = 3500) -
         p2 = _to_int_or_none(h.get("page_end")) or p1
         uri = h.get("uri") or ""
 
-        parts.append(f"Source ID: [^{n}]\nDocument: {uri}\nPage: {p1}" + (f"-{p2}" if p2 != p1 else "") + f"\nContent:\n{trimmed}\n---")
+        page_str = f"{p1}-{p2}" if p2 != p1 else p1
+        parts.append(f"Source ID: [^{n}]\nDocument: {uri}\nPage: {page_str}\nContent:\n{trimmed}\n---")
         footnotes.append({
             "n": n,
             "doc_id": h.get("doc_id"),
@@ -110,13 +143,13 @@ def pack_context(q: str, hits: List[Dict[str, Any]], token_budget: int = 3500) -
             "page_start": p1,
             "page_end": p2,
             "uri": uri,
-            "block_ids": ((h.get("meta") or {}).get("source_block_ids") or []),
+            "block_ids": ((h.get("meta") or _EMPTY_META).get("source_block_ids") or []),
             "score": float(h.get("score", 0.0) or 0.0),
         })
         used.extend([cid for cid in (h.get("chunk_ids") or []) if cid])
         t += tok
         n += 1
-        if did:
-            used_per_doc[did] = used_per_doc.get(did, 0) + 1
+        if capped:
+            used_per_doc[did] += 1
 
     return "\n".join(parts), footnotes, used
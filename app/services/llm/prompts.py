@@ -13,32 +13,29 @@ OUT_SCHEMA = {
     "required": ["answer", "citations", "confidence"]
 }
 
-def build_messages(q: str, context_str: str, mode: str) -> List[Dict[str, str]]:
-    system = (
-        "You answer using the provided context. If not present, try to give your best coverup asking for more context or releted documents in a very helpful and hospitable manner.  "
-        "Use footnote citations like [^1], [^2] that match the context blocks. "
-        "Write the answer in clean, GitHub-flavored Markdown: use headings, bulleted lists, and tables when appropriate; avoid decorative bold for entire paragraphs.\n"
-        "CRITICAL: Do NOT mention document filenames (e.g., 'report.pdf') in your answer text. Use ONLY the footnote markers [^n] to refer to sources."
-    )
-    style = "- Start with a second-level heading: '## Answer' followed by your response.\n"
-    if mode == "NUMERIC_TOTAL":
-        style += "- If the question asks for a total/amount, give a single concise answer first (e.g., \"Total: 12,345.00\"), then add one sentence and a citation.\n"
-    elif mode == "LIST":
-        style += "- Present a short bulleted list. Add a citation [^n] at the end of each bullet.\n"
-    elif mode == "CLAUSE":
-        style += "- Quote the relevant clause precisely, then summarize it in one sentence, with citations.\n"
+# Fixed prompt text, assembled once at import; build_messages only splices in q/context.
+_SYSTEM = (
+    "You answer using the provided context. If not present, try to give your best coverup asking for more context or releted documents in a very helpful and hospitable manner.  "
+    "Use footnote citations like [^1], [^2] that match the context blocks. "
+    "Write the answer in clean, GitHub-flavored Markdown: use headings, bulleted lists, and tables when appropriate; avoid decorative bold for entire paragraphs.\n"
+    "CRITICAL: Do NOT mention document filenames (e.g., 'report.pdf') in your answer text. Use ONLY the footnote markers [^n] to refer to sources."
+)
+_STYLE_BASE = "- Start with a second-level heading: '## Answer' followed by your response.\n"
+_STYLE = {
+    "NUMERIC_TOTAL": _STYLE_BASE + "- If the question asks for a total/amount, give a single concise answer first (e.g., \"Total: 12,345.00\"), then add one sentence and a citation.\n",
+    "LIST": _STYLE_BASE + "- Present a short bulleted list. Add a citation [^n] at the end of each bullet.\n",
+    "CLAUSE": _STYLE_BASE + "- Quote the relevant clause precisely, then summarize it in one sentence, with citations.\n",
+}
+_USER_TAIL = (
+    "- Output a strict JSON object with these keys exactly: {\"answer\": str_markdown, \"citations\": [{\"n\": int}, ...], \"confidence\": float(0..1)}\n"
+    "- The answer must include footnote markers like [^1] that correspond to the citations you return.\n"
+    "- Base your confidence on how directly the context answers the question and how many independent matching citations you used.\n"
+)
 
-    user = (
-        f"Question:\n{q}\n\n"
-        "Context:\n"
-        f"{context_str}\n\n"
-        "Instructions:\n"
-        f"{style}"
-        "- Output a strict JSON object with these keys exactly: {\"answer\": str_markdown, \"citations\": [{\"n\": int}, ...], \"confidence\": float(0..1)}\n"
-        "- The answer must include footnote markers like [^1] that correspond to the citations you return.\n"
-        "- Base your confidence on how directly the context answers the question and how many independent matching citations you used.\n"
-    )
-    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+def build_messages(q: str, context_str: str, mode: str) -> List[Dict[str, str]]:
+    style = _STYLE.get(mode, _STYLE_BASE)
+    user = f"Question:\n{q}\n\nContext:\n{context_str}\n\nInstructions:\n{style}{_USER_TAIL}"
+    return [{"role": "system", "content": _SYSTEM}, {"role": "user", "content": user}]
 
 def build_messages_no_context(q: str) -> List[Dict[str, str]]:
     system = (
@@ -1,9 +1,19 @@
-from typing import List, Dict, Optional, Iterator, Tuple
-import backoff
+from typing import List, Dict, Optional, AsyncIterator, Tuple
+import time
 try:
-    from openai import OpenAI
+    import openai as _openai
+    from openai import OpenAI, AsyncOpenAI
+    # transient failures worth another attempt; auth/validation errors are not
+    _RETRYABLE: Tuple[type, ...] = tuple(
+        e for e in (getattr(_openai, n, None) for n in ("APIConnectionError", "RateLimitError", "InternalServerError")) if e
+    )
 except ImportError:
     OpenAI = None
+    AsyncOpenAI = None
+    _RETRYABLE = ()
+
+_JSON_TRIES = 3
+_STREAM_MIN_CHUNK = 64
 
 from core.interfaces import LLMProvider
 from core.config import settings
@@ -12,11 +22,19 @@ class OpenAIProvider(LLMProvider):
     def __init__(self, api_key: str, base_url: str, model: str):
         self.model = model
         self.client = None
+        # async twin for token streaming from the event loop (pooled keep-alive connections,
+        # no worker thread parked per open stream)
+        self.aclient = None
         if OpenAI and api_key:
             try:
                 self.client = OpenAI(api_key=api_key, base_url=base_url)
             except Exception:
                 self.client = None
+            if AsyncOpenAI:
+                try:
+                    self.aclient = AsyncOpenAI(api_key=api_key, base_url=base_url)
+                except Exception:
+                    self.aclient = None
 
     def generate(self, messages: List[Dict[str, str]], **kwargs) -> str:
         if not self.client:
@@ -32,10 +50,19 @@ class OpenAIProvider(LLMProvider):
         except Exception as e:
             raise e
 
-    @backoff.on_exception(backoff.expo, Exception, max_tries=3)
     def generate_json(self, messages: List[Dict[str, str]], **kwargs) -> str:
         if not self.client:
             raise RuntimeError("llm_disabled")
+        for attempt in range(_JSON_TRIES):
+            try:
+                return self._generate_json_once(messages, **kwargs)
+            except _RETRYABLE:
+                if attempt == _JSON_TRIES - 1:
+                    raise
+                time.sleep(0.5 * (2 ** attempt))
+        return ""
+
+    def _generate_json_once(self, messages: List[Dict[str, str]], **kwargs) -> str:
         # Try native JSON mode first
         try:
             r = self.client.chat.completions.create(
@@ -46,29 +73,45 @@ class OpenAIProvider(LLMProvider):
             )
             msg = r.choices[0].message
             return getattr(msg, "content", "") or ""
+        except _RETRYABLE:
+            raise
         except Exception:
             # Fallback to plain text if JSON mode fails or not supported by model
             return self.generate(messages, **kwargs)
 
-    def stream(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
-        if not self.client:
-            return iter(())
+    # Token deltas are coalesced to at least this many chars per yield, so the SSE layer
+    # sends (and the client renders) a handful of frames per sentence, not one per token.
+    async def astream(self, messages: List[Dict[str, str]], min_chunk: int = _STREAM_MIN_CHUNK, **kwargs) -> AsyncIterator[str]:
+        if not self.aclient:
+            return
+        buf: List[str] = []
+        n = 0
         try:
-            stream = self.client.chat.completions.create(
+            stream = await self.aclient.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 stream=True,
                 **kwargs
             )
-            for chunk in stream:
-                try:
-                    choices = getattr(chunk, "choices", []) or []
-                    for ch in choices:
-                        delta = getattr(ch, "delta", None)
-                        content = getattr(delta, "content", None)
-                        if content:
-                            yield str(content)
-                except Exception:
-                    continue
+            # closing the response (also when the consumer stops early) hands the pooled
+            # connection back instead of leaving it to GC
+            async with stream:
+                async for chunk in stream:
+                    try:
+                        choices = getattr(chunk, "choices", []) or []
+                        for ch in choices:
+                            delta = getattr(ch, "delta", None)
+                            content = getattr(delta, "content", None)
+                            if content:
+                                buf.append(str(content))
+                                n += len(buf[-1])
+                                if n >= min_chunk:
+                                    yield "".join(buf)
+                                    buf.clear()
+                                    n = 0
+                    except Exception:
+                        continue
         except Exception:
-            return iter(())
+            pass
+        if buf:
+            yield "".join(buf)
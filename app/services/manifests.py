@@ -2,14 +2,17 @@ from __future__ import annotations
 
 import uuid
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
+
+
+_TEXT_BLOCK_TYPES = ("paragraph", "header", "list", "code", "text")
 
 
 def new_artifact_id(prefix: str = "art") -> str:
     return f"{prefix}-{uuid.uuid4()}"
 
 
-@dataclass
+@dataclass(slots=True)
 class CanonicalArtifact:
     """Structured representation of a parsed document fragment."""
 
@@ -48,7 +51,7 @@ class CanonicalArtifact:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class CanonicalManifest:
     """Container bundling canonical HTML and structured artefacts."""
 
@@ -60,15 +63,40 @@ class CanonicalManifest:
     artifacts: List[CanonicalArtifact] = field(default_factory=list)
     warnings: List[str] = field(default_factory=list)
     stats: Dict[str, Any] = field(default_factory=dict)
-
-    def iter_text_blocks(self) -> List[CanonicalArtifact]:
-        return [a for a in self.artifacts if a.type in {"paragraph", "header", "list", "code", "text"}]
-
-    def iter_tables(self) -> List[CanonicalArtifact]:
-        return [a for a in self.artifacts if a.type == "table"]
-
-    def iter_images(self) -> List[CanonicalArtifact]:
-        return [a for a in self.artifacts if a.type == "image"]
+    # type -> artifact positions, built on first iter_* call. Tagged with the artifacts list
+    # identity and length so reassigning or appending to `artifacts` rebuilds it; in-place
+    # edits that change an artifact's type are not tracked.
+    _by_type: Optional[Dict[str, List[int]]] = field(default=None, init=False, repr=False, compare=False)
+    _by_type_tag: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+
+    def _type_index(self) -> Dict[str, List[int]]:
+        tag = (id(self.artifacts), len(self.artifacts))
+        if self._by_type is None or self._by_type_tag != tag:
+            index: Dict[str, List[int]] = {}
+            for i, a in enumerate(self.artifacts):
+                index.setdefault(a.type, []).append(i)
+            self._by_type, self._by_type_tag = index, tag
+        return self._by_type
+
+    def _of_types(self, *types: str) -> Iterator[CanonicalArtifact]:
+        index = self._type_index()
+        artifacts = self.artifacts
+        if len(types) == 1:
+            positions = index.get(types[0], ())
+        else:
+            positions = sorted(i for t in types for i in index.get(t, ()))
+        for i in positions:
+            yield artifacts[i]
+
+    # Generators; wrap in list() where a sequence is needed.
+    def iter_text_blocks(self) -> Iterator[CanonicalArtifact]:
+        return self._of_types(*_TEXT_BLOCK_TYPES)
+
+    def iter_tables(self) -> Iterator[CanonicalArtifact]:
+        return self._of_types("table")
+
+    def iter_images(self) -> Iterator[CanonicalArtifact]:
+        return self._of_types("image")
 
     def to_dict(self, include_html: bool = True) -> Dict[str, Any]:
         data = {
@@ -1,7 +1,12 @@
 from __future__ import annotations
-import os, tempfile, time, html, io
+import os, tempfile, time, html, threading, multiprocessing, hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
 
 # Optional deps; guard imports to make normalization robust across environments
 try:
@@ -25,6 +30,11 @@ except Exception:
 try:
     import fitz  # type: ignore  # PyMuPDF
     _HAS_FITZ = True
+    try:
+        # don't print MuPDF warnings to stderr for every malformed page; they're still in TOOLS.mupdf_warnings()
+        fitz.TOOLS.mupdf_display_errors(False)  # type: ignore
+    except Exception:
+        pass
 except Exception:
     fitz = None  # type: ignore
     _HAS_FITZ = False
@@ -97,8 +107,42 @@ def wrap_txt_to_html(text: str) -> str:
     return f"<!doctype html><html><head><meta charset='utf-8'></head><body>{body}</body></html>"
 
 
-_POCR = None  # lazy init PaddleOCR
+# Content-addressed memo of OCR text: templated forms, letterheads and re-uploaded scans rasterize
+# to identical pixels, and hashing a page costs milliseconds against seconds of OCR. Per process
+# (each page-pool worker has its own); only clean, non-empty results are kept.
+_OCR_CACHE_MAX = 512
+_ocr_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_ocr_cache_lock = threading.Lock()
+
+
 def _ocr_image_to_text(img) -> tuple[str, list[str]]:
+    """_ocr_image_uncached behind the pixel-hash memo. Returns (text, warnings)."""
+    if img is None or not _HAS_PIL:
+        return _ocr_image_uncached(img)
+    try:
+        h = hashlib.blake2b(f"{img.mode}:{img.size}".encode(), digest_size=16)
+        h.update(img.tobytes())
+        key = h.digest()
+    except Exception:
+        return _ocr_image_uncached(img)
+    with _ocr_cache_lock:
+        text = _ocr_cache.get(key)
+        if text is not None:
+            _ocr_cache.move_to_end(key)
+            return text, []
+    text, warnings = _ocr_image_uncached(img)
+    if text and not warnings:
+        with _ocr_cache_lock:
+            _ocr_cache[key] = text
+            _ocr_cache.move_to_end(key)
+            while len(_ocr_cache) > _OCR_CACHE_MAX:
+                _ocr_cache.popitem(last=False)
+    return text, warnings
+
+
+_POCR = None  # lazy init PaddleOCR
+_OCR_CPU_THREADS: Optional[int] = None  # set in page-pool workers by _init_page_worker
+def _ocr_image_uncached(img) -> tuple[str, list[str]]:
     """OCR wrapper using PaddleOCR only. Returns (text, warnings)."""
     warnings: list[str] = []
     if img is None or not _HAS_PIL:
@@ -114,20 +158,23 @@ def _ocr_image_to_text(img) -> tuple[str, list[str]]:
                 # Map common codes to Paddle lang
                 langs = settings.ocr_langs.lower()
                 lang = "en" if "en" in langs or "eng" in langs else "en"
-                _POCR = PaddleOCR(lang=lang, use_angle_cls=True, use_gpu=False, show_log=False)  # type: ignore
-            # Write image to a temp PNG to avoid numpy dependency
-            import tempfile
-            tmp = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-            tmp_path = tmp.name
-            tmp.close()
-            try:
-                img.save(tmp_path, format="PNG")
-                result = _POCR.ocr(tmp_path, cls=True)  # type: ignore
-            finally:
+                # rec_batch_num=1: Paddle sizes its CPU arena by recognition batch and batching buys
+                # nothing on CPU. Page-pool workers get their share of the cores via the pool
+                # initializer; the API process keeps half of them.
+                cpu_threads = _OCR_CPU_THREADS or max(1, (os.cpu_count() or 1) // 2)
                 try:
-                    os.remove(tmp_path)
+                    _POCR = PaddleOCR(  # type: ignore
+                        lang=lang, use_angle_cls=True, use_gpu=False, show_log=False,
+                        rec_batch_num=1, enable_mkldnn=True, cpu_threads=cpu_threads,
+                    )
                 except Exception:
-                    pass
+                    # paddleocr builds that reject the tuning kwargs
+                    _POCR = PaddleOCR(lang=lang, use_angle_cls=True, use_gpu=False, show_log=False)  # type: ignore
+            # Hand Paddle the pixels directly (numpy ships with paddle): no PNG encode, temp file
+            # and decode per page. Paddle expects OpenCV-style BGR.
+            import numpy as np  # type: ignore
+            arr = np.asarray(img.convert("RGB"))[:, :, ::-1]
+            result = _POCR.ocr(arr, cls=True)  # type: ignore
             lines: list[str] = []
             for det in (result or []):
                 if not isinstance(det, list):
@@ -158,6 +205,227 @@ def _ocr_image_to_text(img) -> tuple[str, list[str]]:
     return "", warnings
 
 
+# OCR rasterization: detection/recognition cost scales with pixels, and past ~1600px on the
+# long side there is no accuracy gain on typical documents
+_OCR_TARGET_PX = 1600.0
+_OCR_MIN_SCALE = 1.5
+_OCR_MAX_SCALE = 3.0
+
+
+def _table_cell(c: Any) -> str:
+    s = str(c or "")
+    # plain numbers (most cells in financial tables) have nothing to escape
+    if s.isdigit() or s.replace(".", "", 1).isdigit():
+        return s
+    return html.escape(s)
+
+
+def _render_pdf_page(page, plumber_doc, page_num: int, ocr_allowed: bool) -> Tuple[str, bool, bool, list[str], int, int]:
+    """Render one PDF page to its <section>.
+    Native text layer (plus pdfplumber tables, redacted out of the MuPDF text) when usable,
+    otherwise rasterize + OCR if ocr_allowed.
+    Returns: (section_html, ocr_text_found, ocr_skipped, warnings, plumber_table_count, text_chars)
+    where text_chars is a rough size of the text the section carries (0 = empty page).
+    """
+    warnings: list[str] = []
+    plumber_tables_total = 0
+    # 1. Attempt Table Extraction & De-duplication Setup
+    plumber_tables_found = []
+    if plumber_doc:
+        try:
+            if page_num - 1 < len(plumber_doc.pages):
+                p_plumber = plumber_doc.pages[page_num - 1]
+                # Strategy 1: Default
+                found_objs = p_plumber.find_tables() or []
+                # Strategy 2: Text alignment (if no tables found)
+                if not found_objs:
+                    try:
+                        found_objs = p_plumber.find_tables(table_settings={
+                            "vertical_strategy": "text", 
+                            "horizontal_strategy": "text"
+                        }) or []
+                    except Exception:
+                        pass
+                
+                if found_objs:
+                    plumber_tables_total += len(found_objs)
+                    for tbl in found_objs:
+                        # A. Redact from PyMuPDF Page (De-duplication)
+                        if hasattr(tbl, 'bbox'):
+                            # bbox: (x0, top, x1, bottom)
+                            page.add_redact_annot(fitz.Rect(tbl.bbox))
+                        
+                        # B. Extract Data
+                        data = tbl.extract()
+                        if data:
+                            rows = [r for r in data if any((c or '').strip() for c in r)]
+                            if rows:
+                                buf = ["<div data-source='pdfplumber'><table>"]
+                                for row in rows:
+                                    buf.append("<tr>")
+                                    for c in row:
+                                        buf.append(f"<td>{_table_cell(c)}</td>")
+                                    buf.append("</tr>")
+                                buf.append("</table></div>")
+                                plumber_tables_found.append("".join(buf))
+        except Exception as e:
+            warnings.append(f"pdfplumber_page_setup_failed:{page_num}:{e}")
+
+    try:
+        page_text = (page.get_text("text") or "").strip()
+    except Exception:
+        page_text = ""
+
+    # Quality Check: Trust native if content > 50 chars OR if we successfully extracted tables
+    # If tables found, we trust the PDF is native enough to use.
+    if len(page_text) > 50 or len(plumber_tables_found) > 0:
+        # Native text layer present
+        
+        # Apply Redactions to remove table text from the layout analysis
+        if plumber_tables_found:
+            try:
+                # apply_redactions removes the content covered by the annotations
+                page.apply_redactions()
+            except Exception:
+                pass
+
+        try:
+            frag = page.get_text("xhtml")  # type: ignore
+            # Strip the xml declaration and body tags
+            if "<body>" in frag:
+                frag = frag.split("<body>")[1].split("</body>")[0]
+        except Exception:
+            # If xhtml fails (or after redaction something weird happens);
+            # only re-extract when redactions changed the page text
+            if plumber_tables_found:
+                try:
+                    page_text = (page.get_text("text") or "").strip()
+                except Exception:
+                    page_text = ""
+            frag = f"<pre>{html.escape(page_text)}</pre>"
+
+        # Append the clean structured tables
+        if plumber_tables_found:
+            frag += "".join(plumber_tables_found)
+        
+        # extracted tables always carry at least one non-blank cell
+        text_chars = len(page_text) + len(plumber_tables_found)
+        return f"<section id='p-{page_num}' data-page='{page_num}'>{frag}</section>", False, False, warnings, plumber_tables_total, text_chars
+
+    # Scanned page: rasterize and OCR (subject to caps)
+    if not ocr_allowed:
+        # keep placeholder empty section to preserve page numbering
+        return f"<section id='p-{page_num}' data-page='{page_num}'><pre></pre></section>", False, True, warnings, plumber_tables_total, 0
+    try:
+        # Scale so the long side lands near _OCR_TARGET_PX (A4 -> ~2x); up to 3x (approx 300 DPI) for small pages
+        long_side = max(page.rect.width, page.rect.height) or _OCR_TARGET_PX
+        scale = min(_OCR_MAX_SCALE, max(_OCR_MIN_SCALE, _OCR_TARGET_PX / long_side))
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)  # type: ignore
+        if _HAS_PIL:
+            # raw samples straight into PIL, no PNG encode/decode round-trip
+            mode = "RGB" if pix.n == 3 else ("L" if pix.n == 1 else "CMYK")
+            img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)  # type: ignore
+            if mode != "RGB":
+                img = img.convert("RGB")
+        else:
+            img = None
+    except Exception as e:
+        warnings.append(f"render_failed:{e}")
+        img = None
+    text, w = _ocr_image_to_text(img)
+    warnings.extend(w)
+    return f"<section id='p-{page_num}' data-page='{page_num}'><pre>{html.escape(text)}</pre></section>", bool(text), False, warnings, plumber_tables_total, len(text)
+
+
+def _render_pdf_pages(tmp_path: str, page_nums: List[int], ocr_allowed: bool) -> Tuple[list[str], list[tuple]]:
+    """Page-pool task: reopen the PDF in this process (fitz/pdfplumber docs don't pickle) and
+    render a run of pages.
+    Returns: (open_warnings, [(page_num, section_html, ocr_text_found, ocr_skipped, warnings, tables, text_chars)])
+    """
+    doc = fitz.open(tmp_path)  # type: ignore
+    plumber_doc = None
+    open_warnings: list[str] = []
+    if _HAS_PDFPLUMBER:
+        try:
+            plumber_doc = pdfplumber.open(tmp_path)  # type: ignore
+        except Exception as e:
+            open_warnings.append(f"pdfplumber_failed:{e}")
+    out: list[tuple] = []
+    try:
+        for page_num in page_nums:
+            out.append((page_num, *_render_pdf_page(doc[page_num - 1], plumber_doc, page_num, ocr_allowed)))
+    finally:
+        if plumber_doc:
+            try:
+                plumber_doc.close()
+            except Exception:
+                pass
+        doc.close()
+    return open_warnings, out
+
+
+# Multi-page PDFs fan their pages out to a process pool (OCR and table detection are CPU-bound
+# and hold the GIL). Spawned rather than forked: the API process is multi-threaded. The pool is
+# kept for the life of the process so each worker loads PaddleOCR once.
+_PDF_PAGES_PER_TASK = 5
+_PAGE_POOL: Optional[ProcessPoolExecutor] = None
+_PAGE_POOL_LOCK = threading.Lock()
+
+
+def _init_page_worker(cpu_threads: int) -> None:
+    """Pool initializer: workers split the cores between them instead of each taking half."""
+    global _OCR_CPU_THREADS
+    _OCR_CPU_THREADS = cpu_threads
+
+
+def _page_pool(workers: int) -> ProcessPoolExecutor:
+    global _PAGE_POOL
+    with _PAGE_POOL_LOCK:
+        if _PAGE_POOL is None:
+            _PAGE_POOL = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_page_worker, initargs=(max(1, (os.cpu_count() or 1) // workers),),
+            )
+        return _PAGE_POOL
+
+
+def _discard_page_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool; a no-op if another thread already replaced it."""
+    global _PAGE_POOL
+    with _PAGE_POOL_LOCK:
+        if _PAGE_POOL is not pool:
+            return
+        _PAGE_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_pdf_parallel(tmp_path: str, page_count: int, ocr_allowed: bool, workers: int) -> Tuple[list[str], list[tuple]]:
+    """Render all pages through the pool in runs of _PDF_PAGES_PER_TASK; results come back in page order."""
+    pool = _page_pool(workers)
+    futures = [
+        pool.submit(_render_pdf_pages, tmp_path, list(range(start, min(start + _PDF_PAGES_PER_TASK, page_count + 1))), ocr_allowed)
+        for start in range(1, page_count + 1, _PDF_PAGES_PER_TASK)
+    ]
+    open_warnings: list[str] = []
+    results: list[tuple] = []
+    try:
+        for fut in futures:
+            w, res = fut.result()
+            open_warnings.extend(w)
+            results.extend(res)
+    except BrokenProcessPool:
+        # a worker died: the pool is unusable for every caller, so replace it
+        _discard_page_pool(pool)
+        raise
+    except Exception:
+        # this document failed; the pool is fine and may be serving other documents
+        for fut in futures:
+            fut.cancel()
+        raise
+    # every task reopens the file, so an open failure repeats per task
+    return list(dict.fromkeys(open_warnings)), results
+
+
 def pdf_to_html(tmp_path: str) -> Tuple[str, int, int, list[str]]:
     """PDF pipeline with quick classification per page.
     - If a page has a usable text layer, extract with MuPDF (or unstructured when available for entire-doc fast parse).
@@ -182,13 +450,15 @@ def pdf_to_html(tmp_path: str) -> Tuple[str, int, int, list[str]]:
     OCR_MAX_PAGES = 10000 
     PDF_NATIVE_ONLY_IF_PAGES_GT = 10000
 
-    # Quick doc-level detection: do we have any text at all?
+    # Quick doc-level detection: do we have any text at all? Stop as soon as the threshold is crossed
     total_text_chars = 0
     for page in doc:
         try:
             total_text_chars += len((page.get_text("text") or "").strip())
         except Exception:
             pass
+        if total_text_chars > 100:
+            break
     has_text_layer = total_text_chars > 100  # small threshold
 
     # If entirely native and unstructured is available, let it extract a plain text rendition once
@@ -210,132 +480,62 @@ def pdf_to_html(tmp_path: str) -> Tuple[str, int, int, list[str]]:
     large_native_only = doc.page_count > PDF_NATIVE_ONLY_IF_PAGES_GT
     if large_native_only:
         warnings.append("pdf_native_only_due_to_size")
-    plumber_doc = None
-    if _HAS_PDFPLUMBER:
+
+    # Parallel only where the OCR cap can't bind, since workers don't share a running count
+    page_results: Optional[list[tuple]] = None
+    workers = min(os.cpu_count() or 1, settings.pdf_page_workers)
+    if workers > 1 and settings.pdf_parallel_min_pages <= doc.page_count <= OCR_MAX_PAGES:
         try:
-            plumber_doc = pdfplumber.open(tmp_path)  # type: ignore
+            open_warnings, page_results = _render_pdf_parallel(tmp_path, doc.page_count, not large_native_only, workers)
+            warnings.extend(open_warnings)
         except Exception as e:
-            warnings.append(f"pdfplumber_failed:{e}")
-            plumber_doc = None
-
-    try:
-        for i, page in enumerate(doc):
-            page_num = i + 1
-            # 1. Attempt Table Extraction & De-duplication Setup
-            plumber_tables_found = []
-            if plumber_doc:
-                try:
-                    if page_num - 1 < len(plumber_doc.pages):
-                        p_plumber = plumber_doc.pages[page_num - 1]
-                        # Strategy 1: Default
-                        found_objs = p_plumber.find_tables() or []
-                        # Strategy 2: Text alignment (if no tables found)
-                        if not found_objs:
-                            try:
-                                found_objs = p_plumber.find_tables(table_settings={
-                                    "vertical_strategy": "text", 
-                                    "horizontal_strategy": "text"
-                                }) or []
-                            except Exception:
-                                pass
-                        
-                        if found_objs:
-                            plumber_tables_total += len(found_objs)
-                            for tbl in found_objs:
-                                # A. Redact from PyMuPDF Page (De-duplication)
-                                if hasattr(tbl, 'bbox'):
-                                    # bbox: (x0, top, x1, bottom)
-                                    page.add_redact_annot(fitz.Rect(tbl.bbox))
-                                
-                                # B. Extract Data
-                                data = tbl.extract()
-                                if data:
-                                    rows = [r for r in data if any((c or '').strip() for c in r)]
-                                    if rows:
-                                        tr_html = []
-                                        for row in rows:
-                                            cells = ''.join(f"<td>{html.escape(str(c or ''))}</td>" for c in row)
-                                            tr_html.append(f"<tr>{cells}</tr>")
-                                        plumber_tables_found.append(f"<div data-source='pdfplumber'><table>{''.join(tr_html)}</table></div>")
-                except Exception as e:
-                    warnings.append(f"pdfplumber_page_setup_failed:{page_num}:{e}")
-
+            # render this document in-process instead
+            warnings.append(f"pdf_page_pool_failed:{e}")
+            page_results = None
+
+    if page_results is None:
+        page_results = []
+        plumber_doc = None
+        if _HAS_PDFPLUMBER:
             try:
-                page_text = (page.get_text("text") or "").strip()
-            except Exception:
-                page_text = ""
-
-            # Quality Check: Trust native if content > 50 chars OR if we successfully extracted tables
-            # If tables found, we trust the PDF is native enough to use.
-            if len(page_text) > 50 or len(plumber_tables_found) > 0:
-                # Native text layer present
-                
-                # Apply Redactions to remove table text from the layout analysis
-                if plumber_tables_found:
-                    try:
-                        # apply_redactions removes the content covered by the annotations
-                        page.apply_redactions()
-                    except Exception:
-                        pass
-
+                plumber_doc = pdfplumber.open(tmp_path)  # type: ignore
+            except Exception as e:
+                warnings.append(f"pdfplumber_failed:{e}")
+                plumber_doc = None
+        try:
+            ocr_done = 0
+            for i, page in enumerate(doc):
+                res = _render_pdf_page(page, plumber_doc, i + 1, not large_native_only and ocr_done < OCR_MAX_PAGES)
+                if res[1]:
+                    ocr_done += 1
+                page_results.append((i + 1, *res))
+        finally:
+            if plumber_doc:
                 try:
-                    frag = page.get_text("xhtml")  # type: ignore
-                    # Strip the xml declaration and body tags
-                    if "<body>" in frag:
-                        frag = frag.split("<body>")[1].split("</body>")[0]
+                    plumber_doc.close()
                 except Exception:
-                    # If xhtml fails (or after redaction something weird happens)
-                    frag = html.escape((page.get_text("text") or "").strip())
-                    frag = f"<pre>{frag}</pre>"
-
-                # Append the clean structured tables
-                if plumber_tables_found:
-                    frag += "".join(plumber_tables_found)
-                
-                pages_html.append(f"<section data-page='{page_num}'>{frag}</section>")
-                continue
-
-            # Scanned page: rasterize and OCR (subject to caps)
-            if large_native_only:
-                # keep placeholder empty section to preserve page numbering
-                pages_html.append(f"<section data-page='{page_num}'><pre></pre></section>")
-                continue
-            if ocr_pages >= OCR_MAX_PAGES:
-                warnings.append("ocr_skipped_due_to_cap")
-                pages_html.append(f"<section data-page='{page_num}'><pre></pre></section>")
-                continue
-            try:
-                # 3x scale for Maximum OCR quality (approx 300 DPI)
-                pix = page.get_pixmap(matrix=fitz.Matrix(3, 3))  # type: ignore
-                if _HAS_PIL:
-                    img = Image.open(io.BytesIO(pix.tobytes("png"))).convert("RGB")  # type: ignore
-                else:
-                    img = None
-            except Exception as e:
-                warnings.append(f"render_failed:{e}")
-                img = None
-            text, w = _ocr_image_to_text(img)
-            warnings.extend(w)
-            if text:
-                ocr_pages += 1
-            pages_html.append(f"<section data-page='{page_num}'><pre>{html.escape(text)}</pre></section>")
+                    pass
 
-    finally:
-        if plumber_doc:
-            try:
-                plumber_doc.close()
-            except Exception:
-                pass
+    text_chars_total = 0
+    for _page_num, section_html, ocr_found, ocr_skipped, page_warnings, table_count, text_chars in page_results:
+        text_chars_total += text_chars
+        warnings.extend(page_warnings)
+        if ocr_skipped and not large_native_only:
+            warnings.append("ocr_skipped_due_to_cap")
+        if ocr_found:
+            ocr_pages += 1
+        plumber_tables_total += table_count
+        pages_html.append(section_html)
 
     html_doc = f"<!doctype html><html><head><meta charset='utf-8'></head><body>{''.join(pages_html)}</body></html>"
 
     # If unstructured text is available and the MuPDF text is sparse, include it as a hidden appendix for recall
     if unstructured_text and has_text_layer:
-        appendix = f"<section data-page='0' hidden><pre>{html.escape(unstructured_text)}</pre></section>"
+        appendix = f"<section id='p-0' data-page='0' hidden><pre>{html.escape(unstructured_text)}</pre></section>"
         html_doc = html_doc.replace("</body>", appendix + "</body>")
 
-    text_content = BeautifulSoup(html_doc, 'lxml').get_text() or ""
-    if len(text_content.strip()) == 0:
+    # emptiness from the per-page counts, instead of re-parsing the assembled document
+    if text_chars_total == 0 and not (unstructured_text and unstructured_text.strip() and has_text_layer):
         warnings.append("canonical_empty")
     if ocr_pages > 0:
         warnings.append(f"ocr_pages:{ocr_pages}")
@@ -372,14 +572,19 @@ def pptx_to_html(tmp_path: str) -> Tuple[str, int, int, list[str]]:
                 except Exception:
                     continue
             content = html.escape("\n\n".join(texts))
-            slides.append(f"<section data-page='{idx}'><pre>{content}</pre></section>")
+            slides.append(f"<section id='p-{idx}' data-page='{idx}'><pre>{content}</pre></section>")
         html_doc = f"<!doctype html><html><head><meta charset='utf-8'></head><body>{''.join(slides)}</body></html>"
-        return sanitize_html(html_doc), len(slides) or 1, 0, warnings
+        return html_doc, len(slides) or 1, 0, warnings
     except Exception as e:
         warnings.append(f"pptx_failed:{e}")
         return wrap_txt_to_html("PPTX parse failed"), 1, 0, warnings
 
 
+@lru_cache(maxsize=4096, typed=True)  # typed: 1, 1.0 and True must not share an entry
+def _xlsx_cell(v: Any) -> str:
+    return f"<td>{html.escape(str(v) if v is not None else '')}</td>"
+
+
 def xlsx_to_html(tmp_path: str) -> Tuple[str, int, int, list[str]]:
     warnings: list[str] = []
     if not _HAS_OPENPYXL:
@@ -391,12 +596,11 @@ def xlsx_to_html(tmp_path: str) -> Tuple[str, int, int, list[str]]:
         for ws in wb.worksheets:
             rows = []
             for row in ws.iter_rows(values_only=True):
-                cells = [html.escape(str(c) if c is not None else "") for c in row]
-                rows.append("<tr>" + "".join(f"<td>{c}</td>" for c in cells) + "</tr>")
+                rows.append("<tr>" + "".join([_xlsx_cell(c) for c in row]) + "</tr>")
             table = f"<table>{''.join(rows)}</table>"
-            sheets_html.append(f"<section data-page='1'><div data-sheet='{html.escape(ws.title)}'>{table}</div></section>")
+            sheets_html.append(f"<section id='p-1' data-page='1'><div data-sheet='{html.escape(ws.title)}'>{table}</div></section>")
         html_doc = f"<!doctype html><html><head><meta charset='utf-8'></head><body>{''.join(sheets_html)}</body></html>"
-        return sanitize_html(html_doc), 1, 0, warnings
+        return html_doc, 1, 0, warnings
     except Exception as e:
         warnings.append(f"xlsx_failed:{e}")
         return wrap_txt_to_html("XLSX parse failed"), 1, 0, warnings
@@ -434,6 +638,44 @@ def txt_to_html(tmp_path: str) -> Tuple[str, int, int, list[str]]:
     return wrap_txt_to_html(raw), 1, 0, []
 
 
+# _html_to_artifacts walks the tree with lxml directly (bs4 navigation is pure Python); these
+# keep its text and ancestry checks identical to what the bs4 version reported.
+_PAGE_SECTIONS = etree.XPath("//section[@data-page]")
+_IN_TABLE_OR_LIST = etree.XPath("boolean(ancestor::table or ancestor::ul or ancestor::ol)")
+_IN_FIGURE = etree.XPath("boolean(ancestor::figure)")
+_SKIP_TAGS = frozenset({"script", "style", "noscript"})
+_HEADER_TAGS = frozenset({"h1", "h2", "h3", "h4", "h5", "h6"})
+_LIST_TAGS = frozenset({"ul", "ol"})
+_CONTAINER_TAGS = _LIST_TAGS | {"table"}
+# bs4's get_text skips comments and script/style/template strings
+_TEXT_NODES = etree.XPath(".//text()[not(ancestor::script or ancestor::style or ancestor::template)]")
+
+
+def _node_text(el, sep: str = " ") -> str:
+    """Same as bs4 Tag.get_text(sep, strip=True)."""
+    return sep.join(t for t in (s.strip() for s in _TEXT_NODES(el)) if t)
+
+
+def _parse_html_document(html_doc: str):
+    try:
+        return lxml_html.document_fromstring(html_doc)
+    except ValueError:
+        # str input carrying an XML encoding declaration; let lxml read it as bytes
+        return lxml_html.document_fromstring(html_doc.encode("utf-8"))
+    except etree.ParserError:
+        return lxml_html.document_fromstring("<html><body></body></html>")
+
+
+def _serialize_html_document(root, source: str) -> str:
+    # lxml reports a default HTML 4 doctype for documents that had none; only keep a real one
+    out = lxml_html.tostring(root, encoding="unicode")
+    if source.lstrip()[:9].lower() == "<!doctype":
+        doctype = root.getroottree().docinfo.doctype
+        if doctype:
+            out = f"{doctype}\n{out}"
+    return out
+
+
 class _BuiltInAdapter:
     """Adapter that reuses the in-house converters for generating manifests."""
 
@@ -510,23 +752,9 @@ class NormalizationService:
             warnings.append(f"builtin_parser_failed:{exc}")
             html_doc, page_count, ocr_pages, _ = txt_to_html(file_path)
 
-        html_doc = sanitize_html(html_doc or "")
-        try:
-            soup2 = BeautifulSoup(html_doc, "lxml")
-            changed = False
-            for sec in soup2.find_all("section"):
-                pg = None
-                try:
-                    pg = int(sec.get("data-page")) if sec.has_attr("data-page") else None
-                except Exception:
-                    pg = None
-                if pg is not None:
-                    sec["id"] = f"p-{pg}"
-                    changed = True
-            if changed:
-                html_doc = str(soup2)
-        except Exception:
-            pass
+        # Converters emit page sections with their p-N ids already; only docx/html carry outside
+        # markup, and those sanitize it themselves
+        html_doc = html_doc or ""
         artifacts, annotated_html, stats = self._html_to_artifacts(html_doc)
         html_doc = annotated_html or html_doc
         page_count = page_count or (max((a.page_idx or 0) for a in artifacts) + 1 if artifacts else 0)
@@ -544,21 +772,22 @@ class NormalizationService:
         return manifest
 
     @staticmethod
-    def _resolve_page_index(section: Tag, fallback: int) -> int:
+    def _resolve_page_index(section, fallback: int) -> int:
         try:
-            if section.has_attr("data-page"):
-                return int(section.get("data-page"))
+            page = section.get("data-page")
+            if page is not None:
+                return int(page)
         except Exception:
             pass
         return fallback
 
     @staticmethod
-    def _table_to_text(table: Tag) -> Tuple[str, int, int]:
+    def _table_to_text(table) -> Tuple[str, int, int]:
         rows_text: List[str] = []
         max_cols = 0
         row_count = 0
-        for tr in table.find_all("tr"):
-            cells = [c.get_text(" ", strip=True) for c in tr.find_all(["th", "td"])]
+        for tr in table.iter("tr"):
+            cells = [_node_text(c) for c in tr.iter("th", "td")]
             if not any(cells):
                 continue
             max_cols = max(max_cols, len(cells))
@@ -567,13 +796,16 @@ class NormalizationService:
         return "\n".join(rows_text).strip(), row_count, max_cols
 
     def _html_to_artifacts(self, html_doc: str) -> Tuple[List[CanonicalArtifact], str, Dict[str, Any]]:
-        soup = BeautifulSoup(html_doc, "lxml")
-        sections = soup.find_all("section", attrs={"data-page": True})
+        root = _parse_html_document(html_doc)
+        sections = _PAGE_SECTIONS(root)
         if not sections:
-            sections = [soup.body or soup]
+            body = root.find("body")
+            sections = [body if body is not None else root]
 
         artifacts: List[CanonicalArtifact] = []
-        processed_nodes: set[int] = set()
+        # lxml hands back the same proxy for a node while a reference is held, so the set
+        # can hold the elements themselves
+        processed_nodes: set = set()
         stats: Dict[str, Any] = {
             "artifact_counts": {},
             "text_chars": 0,
@@ -586,24 +818,23 @@ class NormalizationService:
             page_idx = self._resolve_page_index(section, idx)
             header_stack: List[str] = []
 
-            for node in section.descendants:
-                if not isinstance(node, Tag):
+            for node in section.iterdescendants():
+                name = node.tag
+                if not isinstance(name, str):  # comments / processing instructions
                     continue
-                if id(node) in processed_nodes:
+                if node in processed_nodes:
                     continue
 
-                name = (node.name or "").lower()
-                if name in ("script", "style", "noscript"):
+                name = name.lower()
+                if name in _SKIP_TAGS:
                     continue
 
                 # Skip nodes nested inside tables/lists except container tags
-                if any((getattr(anc, "name", "") or "").lower() in ("table", "ul", "ol") for anc in node.parents if isinstance(anc, Tag) and anc is not section):
-                    if name not in ("table", "ul", "ol"):
-                        continue
-
-                text = node.get_text(" ", strip=True)
+                if name not in _CONTAINER_TAGS and _IN_TABLE_OR_LIST(node):
+                    continue
 
-                if name in ("h1", "h2", "h3", "h4", "h5", "h6"):
+                if name in _HEADER_TAGS:
+                    text = _node_text(node)
                     if not text:
                         continue
                     level = int(name[1]) if name[1:].isdigit() else 1
@@ -621,15 +852,16 @@ class NormalizationService:
                         metadata={"level": level},
                     )
                     try:
-                        node["data-artifact-id"] = artifact.artifact_id
-                        node["id"] = f"a-{artifact.artifact_id}"
+                        node.set("data-artifact-id", artifact.artifact_id)
+                        node.set("id", f"a-{artifact.artifact_id}")
                     except Exception:
                         pass
                     artifacts.append(artifact)
-                    processed_nodes.add(id(node))
+                    processed_nodes.add(node)
                     continue
 
                 if name == "p":
+                    text = _node_text(node)
                     if not text:
                         continue
                     stats["artifact_counts"]["paragraph"] = stats["artifact_counts"].get("paragraph", 0) + 1
@@ -642,16 +874,16 @@ class NormalizationService:
                         headers=list(header_stack),
                     )
                     try:
-                        node["data-artifact-id"] = artifact.artifact_id
-                        node["id"] = f"a-{artifact.artifact_id}"
+                        node.set("data-artifact-id", artifact.artifact_id)
+                        node.set("id", f"a-{artifact.artifact_id}")
                     except Exception:
                         pass
                     artifacts.append(artifact)
-                    processed_nodes.add(id(node))
+                    processed_nodes.add(node)
                     continue
 
-                if name in ("ul", "ol"):
-                    items = [li.get_text(" ", strip=True) for li in node.find_all("li", recursive=False)]
+                if name in _LIST_TAGS:
+                    items = [_node_text(li) for li in node.iterchildren("li")]
                     items = [i for i in items if i]
                     if not items:
                         continue
@@ -667,12 +899,12 @@ class NormalizationService:
                         metadata={"items": len(items), "ordered": name == "ol"},
                     )
                     try:
-                        node["data-artifact-id"] = artifact.artifact_id
-                        node["id"] = f"a-{artifact.artifact_id}"
+                        node.set("data-artifact-id", artifact.artifact_id)
+                        node.set("id", f"a-{artifact.artifact_id}")
                     except Exception:
                         pass
                     artifacts.append(artifact)
-                    processed_nodes.add(id(node))
+                    processed_nodes.add(node)
                     continue
 
                 if name == "table":
@@ -686,7 +918,7 @@ class NormalizationService:
                         "rows": rows,
                         "cols": cols,
                         "headers": list(header_stack),
-                        "html": str(node),
+                        "html": lxml_html.tostring(node, encoding="unicode", with_tail=False),
                     }
                     artifact = CanonicalArtifact(
                         artifact_id=new_artifact_id("tbl"),
@@ -697,16 +929,16 @@ class NormalizationService:
                         metadata=meta,
                     )
                     try:
-                        node["data-artifact-id"] = artifact.artifact_id
-                        node["id"] = f"a-{artifact.artifact_id}"
+                        node.set("data-artifact-id", artifact.artifact_id)
+                        node.set("id", f"a-{artifact.artifact_id}")
                     except Exception:
                         pass
                     artifacts.append(artifact)
-                    processed_nodes.add(id(node))
+                    processed_nodes.add(node)
                     continue
 
                 if name == "pre":
-                    raw = node.get_text("\n", strip=True)
+                    raw = _node_text(node, "\n")
                     if not raw:
                         continue
                     stats["artifact_counts"]["code"] = stats["artifact_counts"].get("code", 0) + 1
@@ -719,20 +951,20 @@ class NormalizationService:
                         headers=list(header_stack),
                     )
                     try:
-                        node["data-artifact-id"] = artifact.artifact_id
-                        node["id"] = f"a-{artifact.artifact_id}"
+                        node.set("data-artifact-id", artifact.artifact_id)
+                        node.set("id", f"a-{artifact.artifact_id}")
                     except Exception:
                         pass
                     artifacts.append(artifact)
-                    processed_nodes.add(id(node))
+                    processed_nodes.add(node)
                     continue
 
                 if name == "figure":
-                    img = node.find("img")
-                    if not img:
+                    img = node.find(".//img")
+                    if img is None:
                         continue
-                    caption_tag = node.find("figcaption")
-                    caption = caption_tag.get_text(" ", strip=True) if caption_tag else None
+                    caption_tag = node.find(".//figcaption")
+                    caption = _node_text(caption_tag) if caption_tag is not None else None
                     alt_text = img.get("alt")
                     src = img.get("src")
                     stats["artifact_counts"]["image"] = stats["artifact_counts"].get("image", 0) + 1
@@ -748,18 +980,18 @@ class NormalizationService:
                         raw_path=src,
                     )
                     try:
-                        node["data-artifact-id"] = artifact.artifact_id
-                        node["id"] = f"a-{artifact.artifact_id}"
+                        node.set("data-artifact-id", artifact.artifact_id)
+                        node.set("id", f"a-{artifact.artifact_id}")
                     except Exception:
                         pass
                     artifacts.append(artifact)
-                    processed_nodes.add(id(node))
-                    processed_nodes.add(id(img))
+                    processed_nodes.add(node)
+                    processed_nodes.add(img)
                     continue
 
                 if name == "img":
-                    if any(isinstance(parent, Tag) and parent.name == "figure" for parent in node.parents):
-                        processed_nodes.add(id(node))
+                    if _IN_FIGURE(node):
+                        processed_nodes.add(node)
                         continue
                     alt_text = node.get("alt")
                     src = node.get("src")
@@ -775,12 +1007,12 @@ class NormalizationService:
                         raw_path=src,
                     )
                     try:
-                        node["data-artifact-id"] = artifact.artifact_id
-                        node["id"] = f"a-{artifact.artifact_id}"
+                        node.set("data-artifact-id", artifact.artifact_id)
+                        node.set("id", f"a-{artifact.artifact_id}")
                     except Exception:
                         pass
                     artifacts.append(artifact)
-                    processed_nodes.add(id(node))
+                    processed_nodes.add(node)
                     continue
 
         stats["artifact_total"] = len(artifacts)
@@ -788,7 +1020,7 @@ class NormalizationService:
         if not detected_pages:
             detected_pages = max((a.page_idx or 0) for a in artifacts) + 1 if artifacts else 0
         stats["page_count_detected"] = detected_pages
-        return artifacts, str(soup), stats
+        return artifacts, _serialize_html_document(root, html_doc), stats
 
     @staticmethod
     def _detect_language(sample: str) -> Optional[str]:
@@ -0,0 +1,4 @@
+import os, sys
+
+# Services import their siblings as top-level packages (infra, core, ...), as under uvicorn.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,63 @@
+from services.fact_lookup import FactLookupService
+
+DOC_ID = "0b7c5a0e-3f1d-4c52-9d0e-6a1f2b3c4d5e"
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None, **kw):
+        self.conn.executed.append(sql)
+
+    def fetchall(self):
+        return list(self.conn.rows)
+
+    def fetchone(self):
+        return None
+
+
+class _Conn:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def cursor(self, **kw):
+        return _Cursor(self)
+
+
+class _DB:
+    def __init__(self, rows):
+        self.conn = _Conn(rows)
+        self.chunks_epoch = id(self)
+
+    def connect(self):
+        pass
+
+
+def test_invoice_total_past_2000_chars_is_found():
+    # Invoice number and date up top, the real total at the bottom of a ~800-token chunk.
+    text = "Invoice INV-4711 dated 2024-03-05\n" + ("Line item description\n" * 150) + "Total: ₹12,345.67"
+    assert text.index("Total:") > 2000
+    db = _DB([{"chunk_id": "c1", "doc_id": DOC_ID, "text": text}])
+
+    out = FactLookupService(db)._invoice_total_from_chunks("INV-4711", [DOC_ID])
+
+    assert out is not None
+    assert out["answer"] == "Invoice INV-4711 total: 12345.67."
+    assert not any("LEFT(" in sql for sql in db.conn.executed)
+
+
+def test_non_uuid_doc_ids_match_nothing():
+    db = _DB([{"chunk_id": "c1", "doc_id": DOC_ID, "text": "Invoice INV-1 Total: 10"}])
+
+    out = FactLookupService(db)._invoice_total_from_chunks("INV-1", ["not-a-uuid"])
+
+    assert out is None
+    assert db.conn.executed == []